@@ -0,0 +1,295 @@
+import os
+import wave
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+
+TONE_KINDS = ("sine", "cosine", "square", "sawtooth", "triangle")
+NOISE_KINDS = ("gaussian", "uniform")
+# noise is drawn in blocks of this many samples, each seeded by (seed, block index), so any
+# range of samples can be produced on its own and the chunk size does not change the values
+NOISE_BLOCK = 1 << 16
+# Gaussian noise is given a PCM range of this many standard deviations; the rest is clipped
+GAUSSIAN_BOUND = 4.0
+
+
+def tone_wave(kind: str, phase: np.ndarray) -> np.ndarray:
+
+    # one unit-amplitude Tone kind at the given phases in radians
+    if kind not in TONE_KINDS:
+        raise ValueError(f"Unknown tone kind: {kind}")
+    if kind == "sine":
+        return np.sin(phase)
+    if kind == "cosine":
+        return np.cos(phase)
+    if kind == "square":
+        return np.sign(np.sin(phase))
+    sawtooth = 2 * np.mod(phase / (2 * np.pi), 1.0) - 1
+    return sawtooth if kind == "sawtooth" else 2 * np.abs(sawtooth) - 1
+
+
+class AnalogSource(ABC):
+
+    # A finite analog signal produced chunk by chunk. Iterating yields float64 arrays of at most
+    # chunk_size samples, computed from absolute sample indices, so the joined chunks do not
+    # depend on chunk_size. The length is n_samples, or duration seconds at sample_rate.
+    # bounds is the (vmin, vmax) range for fixed-range PCM of a stream.
+
+    def __init__(self, duration: float = 1.0, sample_rate: float = 8000.0, n_samples: Optional[int] = None,
+                 chunk_size: int = 1 << 16):
+        if sample_rate <= 0:
+            raise ValueError("sample_rate must be positive")
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1")
+        self.sample_rate = float(sample_rate)
+        self.n_samples = int(round(duration * sample_rate)) if n_samples is None else int(n_samples)
+        if self.n_samples < 0:
+            raise ValueError("the signal length must not be negative")
+        self.chunk_size = chunk_size
+
+    @property
+    def duration(self) -> float:
+
+        return self.n_samples / self.sample_rate
+
+    @property
+    @abstractmethod
+    def bounds(self) -> Tuple[float, float]:
+
+        pass
+
+    def __len__(self) -> int:
+
+        return self.n_samples
+
+    def __add__(self, other: "AnalogSource") -> "Mix":
+
+        return Mix(self, other)
+
+    def __iter__(self) -> Iterator[np.ndarray]:
+
+        for start in range(0, self.n_samples, self.chunk_size):
+            yield self.samples(start, min(start + self.chunk_size, self.n_samples))
+
+    def times(self, start: int, stop: int) -> np.ndarray:
+
+        return np.arange(start, stop) / self.sample_rate
+
+    @abstractmethod
+    def samples(self, start: int, stop: int) -> np.ndarray:
+
+        pass
+
+    def to_array(self) -> np.ndarray:
+
+        # the whole signal in memory; stream large signals by iterating instead
+        return self.samples(0, self.n_samples)
+
+
+class Tone(AnalogSource):
+
+    # one periodic waveform; phase in radians. "square" is sign(sin), as the GUI always drew it
+    def __init__(self, frequency: float = 1000.0, amplitude: float = 1.0, phase: float = 0.0, kind: str = "sine",
+                 **timing):
+        super().__init__(**timing)
+        if kind not in TONE_KINDS:
+            raise ValueError(f"Unknown tone kind: {kind}")
+        self.frequency = frequency
+        self.amplitude = amplitude
+        self.phase = phase
+        self.kind = kind
+
+    @property
+    def bounds(self) -> Tuple[float, float]:
+
+        return -abs(self.amplitude), abs(self.amplitude)
+
+    def samples(self, start: int, stop: int) -> np.ndarray:
+
+        return self.amplitude * tone_wave(self.kind, 2 * np.pi * self.frequency * self.times(start, stop) + self.phase)
+
+
+class MultiTone(AnalogSource):
+
+    # sum of sines, one column per tone
+    def __init__(self, frequencies: Sequence[float], amplitudes: Optional[Sequence[float]] = None,
+                 phases: Optional[Sequence[float]] = None, **timing):
+        super().__init__(**timing)
+        self.frequencies = np.asarray(frequencies, dtype=float).reshape(-1)
+        n_tones = self.frequencies.size
+        self.amplitudes = np.ones(n_tones) if amplitudes is None else np.asarray(amplitudes, dtype=float)
+        self.phases = np.zeros(n_tones) if phases is None else np.asarray(phases, dtype=float)
+        if not n_tones or self.amplitudes.shape != (n_tones,) or self.phases.shape != (n_tones,):
+            raise ValueError("frequencies, amplitudes and phases must be non-empty and of equal length")
+
+    @property
+    def bounds(self) -> Tuple[float, float]:
+
+        peak = float(np.sum(np.abs(self.amplitudes)))
+        return -peak, peak
+
+    def samples(self, start: int, stop: int) -> np.ndarray:
+
+        x = 2 * np.pi * self.times(start, stop)[:, None] * self.frequencies + self.phases
+        return np.sin(x) @ self.amplitudes
+
+
+class Chirp(AnalogSource):
+
+    # sine sweeping from f0 to f1 over the whole duration, linearly or exponentially in frequency
+    def __init__(self, f0: float = 100.0, f1: float = 4000.0, amplitude: float = 1.0, method: str = "linear",
+                 **timing):
+        super().__init__(**timing)
+        if method not in ("linear", "exponential"):
+            raise ValueError(f"Unknown chirp method: {method}")
+        if method == "exponential" and not (f0 > 0 and f1 > 0):
+            raise ValueError("an exponential chirp needs positive frequencies")
+        self.f0 = f0
+        self.f1 = f1
+        self.amplitude = amplitude
+        self.method = method
+
+    @property
+    def bounds(self) -> Tuple[float, float]:
+
+        return -abs(self.amplitude), abs(self.amplitude)
+
+    def samples(self, start: int, stop: int) -> np.ndarray:
+
+        t, total = self.times(start, stop), max(self.duration, 1 / self.sample_rate)
+        if self.method == "linear" or self.f0 == self.f1:
+            cycles = self.f0 * t + (self.f1 - self.f0) * t ** 2 / (2 * total)
+        else:
+            ratio = self.f1 / self.f0
+            cycles = self.f0 * total / np.log(ratio) * np.expm1(t / total * np.log(ratio))
+        return self.amplitude * np.sin(2 * np.pi * cycles)
+
+
+class Noise(AnalogSource):
+
+    def __init__(self, std: float = 1.0, kind: str = "gaussian", seed: int = 0, **timing):
+        super().__init__(**timing)
+        if kind not in NOISE_KINDS:
+            raise ValueError(f"Unknown noise kind: {kind}")
+        self.std = std
+        self.kind = kind
+        self.seed = seed
+
+    @property
+    def bounds(self) -> Tuple[float, float]:
+
+        # uniform noise of standard deviation std spans +-sqrt(3) std
+        peak = self.std * (GAUSSIAN_BOUND if self.kind == "gaussian" else float(np.sqrt(3)))
+        return -peak, peak
+
+    def _block(self, index: int) -> np.ndarray:
+
+        rng = np.random.default_rng([self.seed, index])
+        if self.kind == "gaussian":
+            return rng.standard_normal(NOISE_BLOCK) * self.std
+        return rng.uniform(-np.sqrt(3), np.sqrt(3), NOISE_BLOCK) * self.std
+
+    def samples(self, start: int, stop: int) -> np.ndarray:
+
+        if stop <= start:
+            return np.empty(0)
+        first, last = start // NOISE_BLOCK, (stop - 1) // NOISE_BLOCK
+        blocks = np.concatenate([self._block(index) for index in range(first, last + 1)])
+        return blocks[start - first * NOISE_BLOCK:stop - first * NOISE_BLOCK]
+
+
+class Mix(AnalogSource):
+
+    # sample-wise sum of sources of equal length and rate, e.g. Tone(...) + Noise(...)
+    def __init__(self, *sources: AnalogSource, chunk_size: Optional[int] = None):
+        if not sources:
+            raise ValueError("Mix needs at least one source")
+        first = sources[0]
+        if any(source.n_samples != first.n_samples or source.sample_rate != first.sample_rate
+               for source in sources):
+            raise ValueError("mixed sources must have the same length and sample rate")
+        super().__init__(sample_rate=first.sample_rate, n_samples=first.n_samples,
+                         chunk_size=chunk_size or first.chunk_size)
+        self.sources: List[AnalogSource] = list(sources)
+
+    @property
+    def bounds(self) -> Tuple[float, float]:
+
+        lows, highs = zip(*(source.bounds for source in self.sources))
+        return float(sum(lows)), float(sum(highs))
+
+    def samples(self, start: int, stop: int) -> np.ndarray:
+
+        return sum(source.samples(start, stop) for source in self.sources)
+
+
+class FileSource(AnalogSource):
+
+    # Samples from a WAV file (integer PCM, scaled to [-1, 1), sample rate from the header) or
+    # a .npy array of shape (n,) or (n, channels), memory mapped, at the given sample_rate.
+    # Channels are averaged unless `channel` picks one. Nothing is read until samples are asked for.
+
+    def __init__(self, path: str, sample_rate: float = 8000.0, channel: Optional[int] = None,
+                 chunk_size: int = 1 << 16):
+        self.path = path
+        self.channel = channel
+        self._bounds = None
+        extension = os.path.splitext(path)[1].lower()
+        if extension == ".wav":
+            with wave.open(path, "rb") as f:
+                self.channels, self.sample_width = f.getnchannels(), f.getsampwidth()
+                sample_rate, n_samples = f.getframerate(), f.getnframes()
+            if self.sample_width not in (1, 2, 3, 4):
+                raise ValueError(f"unsupported WAV sample width: {self.sample_width} bytes")
+            self._array = None
+        elif extension == ".npy":
+            self._array = np.load(path, mmap_mode="r")
+            if self._array.ndim not in (1, 2):
+                raise ValueError("a .npy source must have shape (n,) or (n, channels)")
+            self.channels = 1 if self._array.ndim == 1 else self._array.shape[1]
+            n_samples = self._array.shape[0]
+        else:
+            raise ValueError(f"Unknown analog file type: {extension or path} (use .wav or .npy)")
+        if channel is not None and not 0 <= channel < self.channels:
+            raise ValueError(f"{path} has {self.channels} channels, no channel {channel}")
+        super().__init__(sample_rate=sample_rate, n_samples=n_samples, chunk_size=chunk_size)
+
+    @property
+    def bounds(self) -> Tuple[float, float]:
+
+        if self._array is None:
+            return -1.0, 1.0
+        if self._bounds is None:
+            # one pass over the file, a chunk at a time
+            lows, highs = zip(*((chunk.min(), chunk.max()) for chunk in self)) if self.n_samples else ((0.0,), (0.0,))
+            self._bounds = float(min(lows)), float(max(highs))
+        return self._bounds
+
+    def _frames(self, start: int, stop: int) -> np.ndarray:
+
+        # (frames, channels) float array
+        if self._array is not None:
+            frames = np.asarray(self._array[start:stop], dtype=float)
+            return frames.reshape(frames.shape[0], -1)
+        with wave.open(self.path, "rb") as f:
+            f.setpos(start)
+            data = np.frombuffer(f.readframes(stop - start), dtype=np.uint8)
+        width = self.sample_width
+        if width == 1:
+            # 8-bit WAV is unsigned
+            values = data.astype(float) - 128
+        elif width == 3:
+            triples = data.reshape(-1, 3).astype(np.int32)
+            values = (triples[:, 0] | triples[:, 1] << 8 | triples[:, 2] << 16) << 8 >> 8
+        else:
+            values = data.view(f"<i{width}")
+        return values.reshape(-1, self.channels) / float(1 << (8 * width - 1))
+
+    def samples(self, start: int, stop: int) -> np.ndarray:
+
+        frames = self._frames(start, stop)
+        return frames[:, self.channel] if self.channel is not None else frames.mean(axis=1)
+
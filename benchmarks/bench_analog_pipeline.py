@@ -0,0 +1,59 @@
+import argparse
+import time
+
+from analogsource import Chirp, MultiTone, Noise, Tone
+from digitalsignalgenerator import DigitalSignalGenerator
+from instrumentation import AggregatingSink, Instrumentation
+
+
+def build_source(kind: str, n_samples: int, sample_rate: float):
+
+    timing = {"n_samples": n_samples, "sample_rate": sample_rate}
+    if kind == "tone":
+        return Tone(440.0, **timing)
+    if kind == "multitone":
+        return MultiTone([300.0, 1100.0, 2900.0], [0.6, 0.3, 0.1], **timing)
+    if kind == "chirp":
+        return Chirp(50.0, sample_rate / 2, **timing)
+    return Tone(440.0, amplitude=0.8, **timing) + Noise(0.1, **timing)
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Streamed analog -> PCM/DM -> line code throughput, per stage")
+    parser.add_argument("--min-exp", type=int, default=4)
+    parser.add_argument("--max-exp", type=int, default=7)
+    parser.add_argument("--sample-rate", type=float, default=8000.0, help="analog samples per second")
+    parser.add_argument("--sampling-rate", type=int, default=8, help="line code samples per bit")
+    parser.add_argument("--scheme", default="manchester")
+    parser.add_argument("--modulation", choices=("pcm", "dm"), default="pcm")
+    parser.add_argument("--chunk-size", type=int, default=1 << 16)
+    args = parser.parse_args()
+
+    # every chunk is new input, so the result cache is off
+    generator = DigitalSignalGenerator(cache_bytes=0)
+    generator.sampling_rate = args.sampling_rate
+    stages = AggregatingSink()
+    generator.instrumentation = Instrumentation([stages])
+
+    print(f"{'source':<12}{'samples':>12}{'bits':>12}{'total s':>10}{'Msample/s':>11}")
+    for kind in ("tone", "multitone", "chirp", "noisy"):
+        for exp in range(args.min_exp, args.max_exp + 1):
+            source = build_source(kind, 10 ** exp, args.sample_rate)
+            stages.reset()
+            start = time.perf_counter()
+            if args.modulation == "pcm":
+                bits = generator.pcm_encode_stream(source, 8, chunk_size=args.chunk_size)
+            else:
+                bits = generator.delta_modulation_stream(source, 0.1, chunk_size=args.chunk_size)
+            n_bits = 0
+            for waveform in generator.encode_stream(bits, args.scheme, compact=True):
+                n_bits += waveform.n_bits
+            seconds = time.perf_counter() - start
+            print(f"{kind:<12}{len(source):>12}{n_bits:>12}{seconds:>10.3f}{len(source) / seconds / 1e6:>11.2f}")
+        # the stage split of the largest run; source generation and encode_stream are the remainder
+        print(stages.summary())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.reference import ReferenceSignalGenerator
+from digitalsignalgenerator import DigitalSignalGenerator
+
+
+ENCODERS = ["nrz_l", "nrz_i", "manchester", "differential_manchester", "ami"]
+
+
+def best_of(func, data: str, repeat: int) -> float:
+
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(data)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Line encoder speedup: vectorized vs per-bit loop")
+    parser.add_argument("--min-exp", type=int, default=4)
+    parser.add_argument("--max-exp", type=int, default=7)
+    parser.add_argument("--sampling-rate", type=int, default=4,
+                        help="samples per bit (keep small: 10^7 bits already produce 4*10^7 samples)")
+    parser.add_argument("--reference-limit", type=int, default=10 ** 5,
+                        help="largest input the loop version is timed on; larger sizes are extrapolated")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    # repeated timings of the same input must not be served from the result cache
+    generator = DigitalSignalGenerator(cache_bytes=0)
+    generator.sampling_rate = args.sampling_rate
+    reference = ReferenceSignalGenerator(args.sampling_rate)
+    rng = np.random.default_rng(0)
+
+    print(f"{'encoder':<24}{'bits':>12}{'loop (s)':>14}{'vectorized (s)':>16}{'speedup':>10}")
+    for scheme in ENCODERS:
+        loop_rate = None
+        for exp in range(args.min_exp, args.max_exp + 1):
+            n_bits = 10 ** exp
+            data = (rng.integers(0, 2, n_bits, dtype=np.uint8) + ord('0')).tobytes().decode('ascii')
+            fast = best_of(getattr(generator, scheme), data, args.repeat)
+            if n_bits <= args.reference_limit or loop_rate is None:
+                slow = best_of(getattr(reference, scheme), data, 1)
+                loop_rate = slow / n_bits
+                slow_text = f"{slow:.4f}"
+            else:
+                # the loop is linear in the bit count, so extrapolate from the last measured size
+                slow = loop_rate * n_bits
+                slow_text = f"~{slow:.1f}"
+            print(f"{scheme:<24}{n_bits:>12}{slow_text:>14}{fast:>16.4f}{slow / fast:>9.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.reference import ReferenceSignalGenerator
+from digitalsignalgenerator import DigitalSignalGenerator
+
+
+def best_of(func, data: str, repeat: int) -> float:
+
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(data)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="B8ZS/HDB3 throughput: array engine vs string splicing")
+    parser.add_argument("--min-exp", type=int, default=3)
+    parser.add_argument("--max-exp", type=int, default=7)
+    parser.add_argument("--ones-density", type=float, default=0.2,
+                        help="probability of a '1'; low densities produce many substitutions")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    # repeated timings of the same input must not be served from the result cache
+    generator = DigitalSignalGenerator(cache_bytes=0)
+    generator.sampling_rate = 1
+    reference = ReferenceSignalGenerator()
+    rng = np.random.default_rng(0)
+
+    print(f"{'path':<18}{'bits':>12}{'string (Mbit/s)':>18}{'array (Mbit/s)':>17}{'waveform (Mbit/s)':>20}")
+    for scheme in ["b8zs", "hdb3"]:
+        for exp in range(args.min_exp, args.max_exp + 1):
+            n_bits = 10 ** exp
+            bits = rng.random(n_bits) < args.ones_density
+            data = (bits.astype(np.uint8) + ord('0')).tobytes().decode('ascii')
+            slow = best_of(getattr(reference, f"{scheme}_scramble"), data, args.repeat)
+            fast = best_of(getattr(generator, f"{scheme}_scramble"), data, args.repeat)
+            # the real ternary waveform at one sample per bit, which the string path never produced
+            wave = best_of(getattr(generator, scheme), data, args.repeat)
+            print(f"{scheme + '_scramble':<18}{n_bits:>12}{n_bits / slow / 1e6:>18.2f}"
+                  f"{n_bits / fast / 1e6:>17.2f}{n_bits / wave / 1e6:>20.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+import numpy as np
+
+from typing import List, Tuple
+
+
+class ReferenceSignalGenerator:
+
+    # The original per-bit loop implementations, kept as the baseline the
+    # vectorized paths in DigitalSignalGenerator are checked and timed against.
+
+    def __init__(self, sampling_rate: int = 100):
+        self.bit_duration = 1.0
+        self.sampling_rate = sampling_rate
+
+
+    def nrz_l(self, data: str) -> Tuple[np.ndarray, np.ndarray]:
+
+        signal, time = [], []
+        for i, bit in enumerate(data):
+            t = np.linspace(i, i + 1, self.sampling_rate, endpoint=False)
+            v = 1 if bit == '1' else -1
+            signal.extend([v] * len(t))
+            time.extend(t)
+        return np.array(time), np.array(signal)
+
+    def nrz_i(self, data: str) -> Tuple[np.ndarray, np.ndarray]:
+
+        signal, time, level = [], [], -1
+        for i, bit in enumerate(data):
+            t = np.linspace(i, i + 1, self.sampling_rate, endpoint=False)
+            if bit == '1':
+                level *= -1
+            signal.extend([level] * len(t))
+            time.extend(t)
+        return np.array(time), np.array(signal)
+
+    def manchester(self, data: str) -> Tuple[np.ndarray, np.ndarray]:
+
+        signal, time = [], []
+        for i, bit in enumerate(data):
+            t1 = np.linspace(i, i + 0.5, self.sampling_rate // 2, endpoint=False)
+            t2 = np.linspace(i + 0.5, i + 1, self.sampling_rate // 2, endpoint=False)
+            if bit == '1':
+                signal.extend([-1] * len(t1) + [1] * len(t2))
+            else:
+                signal.extend([1] * len(t1) + [-1] * len(t2))
+            time.extend(list(t1) + list(t2))
+        return np.array(time), np.array(signal)
+
+    def differential_manchester(self, data: str) -> Tuple[np.ndarray, np.ndarray]:
+
+        signal, time, level = [], [], 1
+        for i, bit in enumerate(data):
+            t1 = np.linspace(i, i + 0.5, self.sampling_rate // 2, endpoint=False)
+            t2 = np.linspace(i + 0.5, i + 1, self.sampling_rate // 2, endpoint=False)
+            if bit == '0':
+                level *= -1
+            signal.extend([level] * len(t1))
+            level *= -1
+            signal.extend([level] * len(t2))
+            time.extend(list(t1) + list(t2))
+        return np.array(time), np.array(signal)
+
+    def ami(self, data: str) -> Tuple[np.ndarray, np.ndarray]:
+
+        signal, time, last_one = [], [], -1
+        for i, bit in enumerate(data):
+            t = np.linspace(i, i + 1, self.sampling_rate, endpoint=False)
+            if bit == '0':
+                v = 0
+            else:
+                last_one *= -1
+                v = last_one
+            signal.extend([v] * len(t))
+            time.extend(t)
+        return np.array(time), np.array(signal)
+
+    def find_zero_sequences(self, data: str) -> List[Tuple[int, int]]:
+
+        sequences, i = [], 0
+        while i < len(data):
+            if data[i] == '0':
+                start, count = i, 0
+                while i < len(data) and data[i] == '0':
+                    count += 1;
+                    i += 1
+                sequences.append((start, count))
+            else:
+                i += 1
+        return sequences
+
+    def b8zs_scramble(self, data: str) -> str:
+
+        result = list(data)
+        sequences = self.find_zero_sequences(data)
+        for start, length in sequences:
+            if length >= 8:
+                for j in range(start, start + length - 7, 8):
+                    result[j:j + 8] = ['0', '0', '0', 'V', 'B', '0', 'V', 'B']
+        return ''.join(result)
+
+    def hdb3_scramble(self, data: str) -> str:
+
+        result = list(data)
+        sequences = self.find_zero_sequences(data)
+        ones_count = 0
+        for start, length in sequences:
+            if length >= 4:
+                for j in range(start, start + length - 3, 4):
+                    if ones_count % 2 == 0:
+                        result[j:j + 4] = ['0', '0', '0', 'V']
+                    else:
+                        result[j:j + 4] = ['B', '0', '0', 'V']
+                    ones_count += 1
+        return ''.join(result)
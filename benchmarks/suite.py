@@ -0,0 +1,282 @@
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from typing import Callable, Dict, List, Optional
+
+from bitbuffer import BitBuffer
+from clockrecovery import recover_clock
+from digitalsignalgenerator import DigitalSignalGenerator
+
+
+ENCODERS = {
+    "nrz_l": "nrz_l",
+    "nrz_i": "nrz_i",
+    "manchester": "manchester",
+    "differential_manchester": "diff_manchester",
+    "ami": "ami",
+}
+DECODERS = {
+    "decode_nrz_l": "nrz_l",
+    "decode_nrz_i": "nrz_i",
+    "decode_manchester": "manchester",
+    "decode_differential_manchester": "diff_manchester",
+    "decode_ami": "ami",
+    "b8zs_descramble": "b8zs",
+    "hdb3_descramble": "hdb3",
+}
+# timings below this are dominated by call overhead and timer noise
+MIN_SECONDS = 1e-3
+# clock recovery is also timed and checked on AMI captures behind a lead-in of this many
+# idle samples, with Gaussian noise of this standard deviation
+NOISY_LEAD_IN = 37
+NOISY_SIGMA = 0.3
+# the noisy round trip runs at this rate, on at most this many bits
+NOISY_SAMPLES_PER_BIT = 100
+NOISY_ROUND_TRIP_BITS = 5000
+
+
+class Case:
+
+    # one benchmarked path: prepare(n_bits) builds the arguments outside the timed region
+    def __init__(self, name: str, prepare: Callable, run: Callable):
+        self.name = name
+        self.prepare = prepare
+        self.run = run
+
+
+def random_bits(n_bits: int, seed: int = 0) -> BitBuffer:
+
+    return BitBuffer.from_bits(np.random.default_rng(seed).integers(0, 2, n_bits).astype(bool))
+
+
+def noisy_capture(bits: BitBuffer, samples_per_bit: int, seed: int = 2) -> np.ndarray:
+
+    generator = DigitalSignalGenerator(cache_bytes=0)
+    generator.sampling_rate = samples_per_bit
+    waveform = generator.encode(bits, "ami", compact=True)
+    signal = np.concatenate([np.zeros(NOISY_LEAD_IN), np.repeat(waveform.levels, waveform.samples_per_symbol)])
+    return signal + np.random.default_rng(seed).normal(0.0, NOISY_SIGMA, signal.size)
+
+
+def build_cases(generator: DigitalSignalGenerator, dense: bool) -> List[Case]:
+
+    def samples(scheme: str):
+
+        # decoders read captures, so they get dense int8 samples at the sampling rate
+        def prepare(n_bits: int) -> tuple:
+
+            waveform = generator.encode(random_bits(n_bits), scheme, compact=True)
+            return np.repeat(waveform.levels, waveform.samples_per_symbol),
+
+        return prepare
+
+    cases = [Case(name, lambda n_bits: (random_bits(n_bits),),
+                  lambda bits, name=name: getattr(generator, name)(bits, compact=not dense))
+             for name in ENCODERS]
+    cases += [Case(name, samples(scheme), getattr(generator, name)) for name, scheme in DECODERS.items()]
+    cases += [
+        Case("b8zs_scramble", lambda n_bits: (random_bits(n_bits),), generator.b8zs_scramble),
+        Case("hdb3_scramble", lambda n_bits: (random_bits(n_bits),), generator.hdb3_scramble),
+        # 8-bit PCM: n_bits / 8 samples produce n_bits bits
+        Case("pcm_encode", lambda n_bits: (np.sin(np.linspace(0, 20 * np.pi, max(n_bits // 8, 1))),),
+             lambda analog: generator.pcm_encode(analog, 8, packed=True)),
+        Case("delta_modulation", lambda n_bits: (np.sin(np.linspace(0, 20 * np.pi, n_bits)),),
+             lambda analog: generator.delta_modulation(analog, 0.1, packed=True)),
+        Case("longest_palindrome_manacher", lambda n_bits: (random_bits(n_bits),),
+             generator.longest_palindrome_manacher),
+        Case("recover_clock", samples("nrz_l"), lambda signal: recover_clock(signal, "nrz_l", 2)),
+        Case("recover_clock_noisy", lambda n_bits: (noisy_capture(random_bits(n_bits), generator.sampling_rate),),
+             lambda signal: recover_clock(signal, "ami", 2)),
+    ]
+    return cases
+
+
+def time_call(run: Callable, args: tuple, repeat: int) -> float:
+
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run(*args)
+        best = min(best, time.perf_counter() - start)
+        if best > 1.0:
+            break
+    return best
+
+
+def peak_memory(run: Callable, args: tuple) -> int:
+
+    # numpy reports its buffers to tracemalloc, so this covers array temporaries too
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        run(*args)
+        return tracemalloc.get_traced_memory()[1] - base
+    finally:
+        tracemalloc.stop()
+
+
+def scaling_exponent(sizes: List[int], seconds: List[float]) -> Optional[float]:
+
+    # slope of log(time) over log(size): 1.0 is linear; sizes too fast to time are left out
+    points = [(np.log(n), np.log(t)) for n, t in zip(sizes, seconds) if t >= MIN_SECONDS]
+    if len(points) < 2:
+        return None
+    x, y = np.array(points).T
+    return float(np.polyfit(x, y, 1)[0])
+
+
+def run_case(case: Case, sizes: List[int], repeat: int, max_seconds: float, memory: bool) -> dict:
+
+    result = {"sizes": [], "seconds": [], "bits_per_s": [], "peak_bytes": [], "skipped": []}
+    for n_bits in sizes:
+        if result["seconds"] and result["seconds"][-1] * n_bits / result["sizes"][-1] > max_seconds:
+            # linear extrapolation says this size would blow the time budget
+            result["skipped"].append(n_bits)
+            continue
+        args = case.prepare(n_bits)
+        seconds = time_call(case.run, args, repeat)
+        result["sizes"].append(n_bits)
+        result["seconds"].append(seconds)
+        result["bits_per_s"].append(n_bits / seconds)
+        result["peak_bytes"].append(peak_memory(case.run, args) if memory else None)
+        del args
+    result["exponent"] = scaling_exponent(result["sizes"], result["seconds"])
+    return result
+
+
+def round_trips(generator: DigitalSignalGenerator, n_bits: int) -> Dict[str, str]:
+
+    # "ok" or "FAILED: <what>"
+    bits = random_bits(n_bits, seed=1)
+    report = {}
+    for scheme in generator.SCHEMES:
+        decoded = generator.decode_bits(generator.encode(bits, scheme, compact=True), scheme)
+        dense = generator.decode_bits(generator.encode(bits, scheme)[1], scheme)
+        if decoded != dense:
+            report[scheme] = "FAILED: compact and dense decoding disagree"
+        else:
+            report[scheme] = "ok" if decoded == bits else "FAILED: decoded bits differ"
+
+    analog = np.sin(np.linspace(0, 20 * np.pi, max(n_bits // 8, 2)))
+    restored = generator.pcm_decode(generator.pcm_encode(analog, 8, packed=True), 8, analog.min(), analog.max())
+    step = (analog.max() - analog.min()) / 255
+    report["pcm"] = "ok" if np.all(np.abs(restored - analog) <= step + 1e-12) else "FAILED: error above one step"
+
+    dm_bits, staircase = generator.delta_modulate(analog, 0.1)
+    rebuilt = generator.delta_demodulate(dm_bits, 0.1, initial=float(analog[0]))
+    report["delta_modulation"] = "ok" if np.allclose(rebuilt, staircase) else "FAILED: staircase not rebuilt"
+
+    # the recovered clock must decode the noisy capture at least as well as the decoder given
+    # the true phase and rate
+    noisy_bits = bits[:NOISY_ROUND_TRIP_BITS]
+    signal = noisy_capture(noisy_bits, NOISY_SAMPLES_PER_BIT)
+    aligned = DigitalSignalGenerator(cache_bytes=0)
+    aligned.sampling_rate = NOISY_SAMPLES_PER_BIT
+    recovered = generator.decode_bits(recover_clock(signal, "ami", 2), "ami").unpack()
+    expected = noisy_bits.unpack()
+    if recovered.size != expected.size:
+        report["recover_clock_noisy"] = f"FAILED: {recovered.size} bits recovered from {expected.size}"
+    else:
+        errors = np.count_nonzero(recovered != expected)
+        limit = np.count_nonzero(aligned.decode_bits(signal[NOISY_LEAD_IN:], "ami").unpack() != expected)
+        report["recover_clock_noisy"] = "ok" if errors <= limit else f"FAILED: {errors} bit errors, {limit} aligned"
+
+    palindrome, start, length = generator.longest_palindrome_manacher(bits)
+    text = bits[start:start + length].to_str()
+    valid = palindrome == text == text[::-1] and length == len(palindrome)
+    report["longest_palindrome_manacher"] = "ok" if valid else "FAILED: result is not a palindrome of the input"
+    return report
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> List[str]:
+
+    # a regression is a throughput drop past threshold at any size both runs timed reliably
+    regressions = []
+    for name, current in results["cases"].items():
+        previous = baseline.get("cases", {}).get(name)
+        if previous is None:
+            continue
+        old = {n: (s, r) for n, s, r in zip(previous["sizes"], previous["seconds"], previous["bits_per_s"])}
+        for n_bits, seconds, rate in zip(current["sizes"], current["seconds"], current["bits_per_s"]):
+            if n_bits not in old or min(seconds, old[n_bits][0]) < MIN_SECONDS:
+                continue
+            if rate < old[n_bits][1] * (1 - threshold):
+                regressions.append(f"{name} @ {n_bits} bits: {rate / 1e6:.2f} Mbit/s, "
+                                   f"baseline {old[n_bits][1] / 1e6:.2f} Mbit/s")
+    return regressions
+
+
+def main() -> int:
+
+    parser = argparse.ArgumentParser(description="Throughput, memory and scaling of every encode/decode path")
+    parser.add_argument("--min-exp", type=int, default=2)
+    parser.add_argument("--max-exp", type=int, default=7)
+    parser.add_argument("--sampling-rate", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--dense", action="store_true",
+                        help="time encoders with dense (time, signal) output instead of compact levels")
+    parser.add_argument("--max-seconds", type=float, default=10.0,
+                        help="skip sizes a path is extrapolated to need longer than this for")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc peak-memory pass")
+    parser.add_argument("--only", nargs="+", help="benchmark just these paths")
+    parser.add_argument("--round-trip-bits", type=int, default=10 ** 5)
+    parser.add_argument("-o", "--output", help="write results as JSON")
+    parser.add_argument("--baseline", help="JSON from an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="fail when throughput drops by more than this fraction (default 0.25)")
+    args = parser.parse_args()
+
+    generator = DigitalSignalGenerator(cache_bytes=0)
+    generator.sampling_rate = args.sampling_rate
+    sizes = [10 ** exp for exp in range(args.min_exp, args.max_exp + 1)]
+    cases = [case for case in build_cases(generator, args.dense) if not args.only or case.name in args.only]
+
+    results = {
+        "meta": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "sampling_rate": args.sampling_rate,
+            "dense": args.dense,
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "cases": {},
+    }
+    print(f"{'path':<32}{'bits':>10}{'Mbit/s':>10}{'peak MiB':>10}")
+    for case in cases:
+        result = run_case(case, sizes, args.repeat, args.max_seconds, not args.no_memory)
+        results["cases"][case.name] = result
+        for n_bits, rate, peak in zip(result["sizes"], result["bits_per_s"], result["peak_bytes"]):
+            peak_text = "-" if peak is None else f"{peak / 2 ** 20:.1f}"
+            print(f"{case.name:<32}{n_bits:>10}{rate / 1e6:>10.2f}{peak_text:>10}")
+        exponent = "n/a" if result["exponent"] is None else f"{result['exponent']:.2f}"
+        skipped = f", skipped {result['skipped']}" if result["skipped"] else ""
+        print(f"{case.name:<32}scaling exponent {exponent}{skipped}")
+
+    results["round_trip"] = round_trips(generator, args.round_trip_bits)
+    failed = False
+    for name, status in results["round_trip"].items():
+        print(f"round trip {name:<28}{status}")
+        failed |= status.startswith("FAILED")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        failed |= bool(regressions)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
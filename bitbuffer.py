@@ -0,0 +1,112 @@
+import numpy as np
+
+from typing import Optional
+
+
+BYTES_LIKE = (bytes, bytearray, memoryview)
+
+
+def as_bits(data) -> np.ndarray:
+
+    # accepted bit sources: '0'/'1' strings, BitBuffer, raw bytes-like objects and uint8
+    # arrays (both packed MSB-first), bool or other integer arrays (one 0/1 value per bit)
+    if isinstance(data, str):
+        return np.frombuffer(data.encode('ascii', 'replace'), dtype=np.uint8) == ord('1')
+    if isinstance(data, BitBuffer):
+        return data.unpack()
+    if isinstance(data, BYTES_LIKE):
+        return np.unpackbits(np.frombuffer(data, dtype=np.uint8)).view(bool)
+    array = np.asarray(data)
+    if array.dtype == np.uint8:
+        return np.unpackbits(array.reshape(array.shape or (1,)), axis=-1).view(bool)
+    return array.astype(bool, copy=False)
+
+
+class BitBuffer:
+
+    # Bits packed MSB-first into uint8 (np.packbits order) plus the exact bit count,
+    # so a bit stream costs one eighth of a '0'/'1' string and strings are only
+    # built when something asks for one.
+
+    __slots__ = ("packed", "n_bits")
+
+    def __init__(self, packed: np.ndarray, n_bits: int):
+        self.packed = packed
+        self.n_bits = n_bits
+
+    @classmethod
+    def from_bits(cls, bits: np.ndarray) -> "BitBuffer":
+
+        bits = np.asarray(bits, dtype=bool)
+        return cls(np.packbits(bits), bits.size)
+
+    @classmethod
+    def from_bytes(cls, data, n_bits: Optional[int] = None) -> "BitBuffer":
+
+        # no copy: the buffer shares memory with bytes, bytearray, memoryview or uint8 arrays
+        packed = np.frombuffer(data, dtype=np.uint8) if isinstance(data, BYTES_LIKE) else np.asarray(data).ravel()
+        if n_bits is None:
+            n_bits = packed.size * 8
+        if not 0 <= n_bits <= packed.size * 8:
+            raise ValueError(f"n_bits={n_bits} does not fit in {packed.size} bytes")
+        return cls(packed, n_bits)
+
+    @classmethod
+    def coerce(cls, data) -> "BitBuffer":
+
+        if isinstance(data, BitBuffer):
+            return data
+        if isinstance(data, BYTES_LIKE) or (isinstance(data, np.ndarray) and data.dtype == np.uint8):
+            return cls.from_bytes(data)
+        return cls.from_bits(as_bits(data))
+
+    def unpack(self) -> np.ndarray:
+
+        return np.unpackbits(self.packed, count=self.n_bits).view(bool)
+
+    def to_str(self) -> str:
+
+        return (np.unpackbits(self.packed, count=self.n_bits) + ord('0')).tobytes().decode('ascii')
+
+    def to_bytes(self) -> bytes:
+
+        # bits past n_bits in the last byte are cleared, as np.packbits would leave them
+        return np.packbits(self.unpack()).tobytes()
+
+    def count(self) -> int:
+
+        return int(np.count_nonzero(self.unpack()))
+
+    def __getitem__(self, key) -> "BitBuffer":
+
+        if not isinstance(key, slice):
+            raise TypeError("BitBuffer only supports slicing; use unpack() for single bits")
+        start, stop, step = key.indices(self.n_bits)
+        if step == 1 and start % 8 == 0:
+            # byte aligned: share the packed bytes instead of unpacking everything
+            stop = max(start, stop)
+            return BitBuffer(self.packed[start // 8:(stop + 7) // 8], stop - start)
+        return BitBuffer.from_bits(self.unpack()[key])
+
+    def __len__(self) -> int:
+
+        return self.n_bits
+
+    def __str__(self) -> str:
+
+        return self.to_str()
+
+    def __repr__(self) -> str:
+
+        preview = self[:64].to_str() + ('...' if self.n_bits > 64 else '')
+        return f"BitBuffer('{preview}', n_bits={self.n_bits})"
+
+    def __eq__(self, other) -> bool:
+
+        if isinstance(other, str):
+            return self.to_str() == other
+        if not isinstance(other, BitBuffer):
+            return NotImplemented
+        return self.n_bits == other.n_bits and np.array_equal(self.unpack(), other.unpack())
+
+    __hash__ = None
@@ -0,0 +1,139 @@
+import os
+
+import numpy as np
+
+from typing import Dict, List, Optional, Sequence
+
+from digitalsignalgenerator import DigitalSignalGenerator
+
+
+class ChannelModel:
+
+    # Impairments applied to a stack of waveforms (..., n_samples), all vectorized:
+    #   snr_db            AWGN; signal power over noise variance per sample, in dB (None: no noise).
+    #                     Decoders average a whole bit, so the per-bit SNR is higher by
+    #                     10*log10(samples per symbol).
+    #   wander            baseline wander amplitude (signal levels are +-1) ...
+    #   wander_period     ... as a sine of this period in bits, with a random phase per row
+    #   jitter            white sampling-clock jitter, standard deviation in samples
+    #   drift_ppm         receiver clock offset in parts per million; samples slide over the row
+
+    def __init__(self, snr_db: Optional[float] = None, wander: float = 0.0, wander_period: float = 1000.0,
+                 jitter: float = 0.0, drift_ppm: float = 0.0):
+        self.snr_db = snr_db
+        self.wander = wander
+        self.wander_period = wander_period
+        self.jitter = jitter
+        self.drift_ppm = drift_ppm
+
+    def with_snr(self, snr_db: Optional[float]) -> "ChannelModel":
+
+        return ChannelModel(snr_db, self.wander, self.wander_period, self.jitter, self.drift_ppm)
+
+    def __repr__(self) -> str:
+
+        return (f"ChannelModel(snr_db={self.snr_db}, wander={self.wander}, wander_period={self.wander_period}, "
+                f"jitter={self.jitter}, drift_ppm={self.drift_ppm})")
+
+    def apply(self, signals: np.ndarray, rng: np.random.Generator, sampling_rate: int) -> np.ndarray:
+
+        signals = np.asarray(signals, dtype=float)
+        rows, n_samples = signals.shape[:-1], signals.shape[-1]
+        if self.jitter or self.drift_ppm:
+            # resample at the receiver's clock: nearest sample, since the waveforms are steps
+            instants = np.arange(n_samples) * (1 + self.drift_ppm * 1e-6)
+            if self.jitter:
+                instants = instants + rng.normal(0.0, self.jitter, rows + (n_samples,))
+            index = np.clip(np.rint(instants), 0, n_samples - 1).astype(np.intp)
+            signals = np.take_along_axis(signals, np.broadcast_to(index, rows + (n_samples,)), axis=-1)
+        else:
+            signals = signals.copy()
+        if self.wander:
+            phase = rng.uniform(0.0, 2 * np.pi, rows + (1,))
+            cycles = np.arange(n_samples) / (self.wander_period * sampling_rate)
+            signals += self.wander * np.sin(2 * np.pi * cycles + phase)
+        if self.snr_db is not None:
+            power = np.mean(signals ** 2, axis=-1, keepdims=True)
+            signals += rng.standard_normal(signals.shape) * np.sqrt(power / 10 ** (self.snr_db / 10))
+        return signals
+
+
+def _ber_task(scheme: str, channel: Optional[ChannelModel], n_bits: int, trials: int, batch_trials: int,
+              sampling_rate: int, sampling: str, seed: np.random.SeedSequence) -> int:
+
+    # bit errors over `trials` random frames of n_bits, encoded and decoded batch_trials at a time
+    generator = DigitalSignalGenerator(cache_bytes=0)
+    generator.sampling_rate = sampling_rate
+    rng = np.random.default_rng(seed)
+    errors = 0
+    for start in range(0, trials, batch_trials):
+        bits = rng.integers(0, 2, (min(batch_trials, trials - start), n_bits)).astype(bool)
+        signals = generator.encode_batch(bits, [scheme])[scheme][1]
+        if channel is not None:
+            signals = channel.apply(signals, rng, sampling_rate)
+        decoded = generator.decode_batch(signals, scheme, sampling)
+        n = min(decoded.shape[-1], n_bits)
+        # bits the decoder dropped count as errors
+        errors += int(np.count_nonzero(decoded[:, :n] != bits[:, :n])) + bits.shape[0] * (n_bits - n)
+    return errors
+
+
+def ber_sweep(schemes: Sequence[str], snr_db: Sequence[float], channel: Optional[ChannelModel] = None,
+              n_bits: int = 10_000, trials: int = 20, batch_trials: int = 16, sampling_rate: int = 8,
+              sampling: str = "mean", seed: int = 0, max_workers: Optional[int] = None,
+              parallel_threshold: int = 1 << 22) -> Dict[str, dict]:
+
+    # Monte Carlo BER per scheme and SNR point. Every (scheme, point) task draws from its own
+    # child of SeedSequence(seed), so results do not depend on max_workers. Each scheme also
+    # gets a noiseless "floor" run: the BER its decoder reaches on a perfect channel.
+    # Sweeps of at least parallel_threshold bits in total run on a process pool.
+    # Returns {scheme: {"snr_db", "errors", "bits", "ber": arrays, "floor": float}}.
+    channel = channel or ChannelModel()
+    for scheme in schemes:
+        if scheme not in DigitalSignalGenerator.SCHEMES:
+            raise ValueError(f"Unknown encoding scheme: {scheme}")
+    tasks = [(scheme, None) for scheme in schemes]
+    tasks += [(scheme, channel.with_snr(snr)) for scheme in schemes for snr in snr_db]
+    seeds = np.random.SeedSequence(seed).spawn(len(tasks))
+    args = [(scheme, model, n_bits, trials, batch_trials, sampling_rate, sampling, child)
+            for (scheme, model), child in zip(tasks, seeds)]
+
+    workers = max_workers or os.cpu_count() or 1
+    if workers == 1 or len(tasks) == 1 or len(tasks) * n_bits * trials < parallel_threshold:
+        errors = [_ber_task(*task) for task in args]
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            errors = [future.result() for future in [pool.submit(_ber_task, *task) for task in args]]
+
+    total_bits = n_bits * trials
+    floors, curves = errors[:len(schemes)], np.array(errors[len(schemes):]).reshape(len(schemes), len(snr_db))
+    return {
+        scheme: {
+            "snr_db": np.asarray(snr_db, dtype=float),
+            "errors": curves[i],
+            "bits": np.full(len(snr_db), total_bits),
+            "ber": curves[i] / total_bits,
+            "floor": floors[i] / total_bits,
+        }
+        for i, scheme in enumerate(schemes)
+    }
+
+
+def format_ber_table(results: Dict[str, dict]) -> str:
+
+    # one row per SNR point, one column per scheme; the last row is the noiseless floor
+    schemes = list(results)
+    if not schemes:
+        return ""
+    lines = [f"{'SNR dB':>8}" + "".join(f"{scheme:>17}" for scheme in schemes)]
+    for i, snr in enumerate(results[schemes[0]]["snr_db"]):
+        lines.append(f"{snr:>8.1f}" + "".join(f"{results[scheme]['ber'][i]:>17.3e}" for scheme in schemes))
+    lines.append(f"{'floor':>8}" + "".join(f"{results[scheme]['floor']:>17.3e}" for scheme in schemes))
+    return "\n".join(lines)
+
+
+def snr_points(start: float, stop: float, step: float) -> List[float]:
+
+    return [float(snr) for snr in np.arange(start, stop + step / 2, step)]
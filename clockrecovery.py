@@ -0,0 +1,408 @@
+import numpy as np
+
+from typing import Iterator, Optional, Tuple
+
+from compactwaveform import CompactWaveform
+from digitalsignalgenerator import DigitalSignalGenerator
+
+
+TERNARY_SCHEMES = ("ami", "b8zs", "hdb3")
+PERIOD_METHODS = ("histogram", "fft")
+# with no transition for this many samples, symbols are emitted on the last phase estimate
+# instead of buffering the capture until the next transition
+MAX_HOLD_SAMPLES = 1 << 20
+# the period is estimated on at most this many samples from the start of a capture
+TRAINING_SAMPLES = 1 << 18
+# edges are found on a moving mean over this fraction of a symbol, and level runs shorter
+# than GLITCH_FRACTION of a symbol are merged as glitches
+SMOOTHING_FRACTION = 0.25
+GLITCH_FRACTION = 0.5
+
+
+def _hold(sliced: np.ndarray, level: Optional[int]) -> np.ndarray:
+
+    # replaces the undecided samples (2) by the last decided level, `level` before the first
+    # one (or the first decided level if None), through a running maximum of indices
+    decided = np.where(sliced != 2, np.arange(sliced.size), -1)
+    np.maximum.accumulate(decided, out=decided)
+    if level is None:
+        first = np.flatnonzero(decided >= 0)
+        level = int(sliced[decided[first[0]]]) if first.size else 0
+    return np.where(decided >= 0, sliced[decided], level).astype(np.int8)
+
+
+def moving_average(signal: np.ndarray, width: int, history: Optional[np.ndarray] = None) -> np.ndarray:
+
+    # causal mean over the last `width` samples; history holds the width - 1 samples before
+    # signal (the first sample repeated if None), so consecutive chunks filter like one array
+    signal = np.asarray(signal, dtype=float)
+    if width <= 1 or not signal.size:
+        return signal
+    if history is None:
+        history = np.full(width - 1, signal[0])
+    sums = np.concatenate([[0.0], np.cumsum(np.concatenate([history, signal]))])
+    return (sums[width:] - sums[:-width]) / width
+
+
+def slice_levels(signal: np.ndarray, amplitude: float, ternary: bool, level: Optional[int] = None,
+                 min_run: int = 1) -> np.ndarray:
+
+    # int8 levels with hysteresis: samples inside a dead band between two levels repeat the
+    # last decided level. Runs shorter than min_run samples (glitches from noise or jitter
+    # around a transition) are held too, except the last one, which may continue in the next chunk.
+    x = np.asarray(signal, dtype=float) / amplitude
+    if ternary:
+        sliced = np.where(x > 0.65, 1, np.where(x < -0.65, -1, np.where(np.abs(x) < 0.35, 0, 2)))
+    else:
+        sliced = np.where(x > 0.25, 1, np.where(x < -0.25, -1, 2))
+    levels = _hold(sliced, level)
+    if min_run > 1 and levels.size:
+        starts = np.flatnonzero(np.diff(levels, prepend=np.int8(levels[0] + 1)))
+        lengths = np.diff(starts, append=levels.size)
+        short = np.flatnonzero(lengths[:-1] < min_run)
+        if short.size:
+            glitch = np.zeros(levels.size + 1, dtype=np.int8)
+            np.add.at(glitch, starts[short], 1)
+            np.add.at(glitch, starts[short] + lengths[short], -1)
+            levels[np.cumsum(glitch[:-1]) > 0] = 2
+            levels = _hold(levels, level)
+    return levels
+
+
+def detect_edges(signal: np.ndarray, amplitude: float, ternary: bool, level: Optional[int] = None,
+                 min_run: int = 1) -> Tuple[np.ndarray, int]:
+
+    # sample indices where a new level starts, and the level at the end for the next chunk;
+    # with level=None the first sample opens no edge
+    levels = slice_levels(signal, amplitude, ternary, level, min_run)
+    if not levels.size:
+        return np.empty(0, dtype=np.intp), level or 0
+    previous = levels[0] if level is None else level
+    edges = np.flatnonzero(np.diff(levels, prepend=np.int8(previous)))
+    return edges, int(levels[-1])
+
+
+def estimate_amplitude(signal: np.ndarray) -> float:
+
+    # median magnitude of the samples within a factor of two of the peak, so zero symbols
+    # (AMI) and a few noise spikes do not pull it
+    magnitude = np.abs(np.asarray(signal, dtype=float))
+    if not magnitude.size:
+        raise ValueError("no samples to estimate the amplitude from")
+    peak = np.percentile(magnitude, 99)
+    if peak == 0:
+        raise ValueError("signal is flat; there is no clock to recover")
+    return float(np.median(magnitude[magnitude >= peak / 2]))
+
+
+def estimate_period(edges: np.ndarray, method: str = "histogram", min_period: float = 2.0,
+                    nominal: Optional[float] = None) -> float:
+
+    # samples per symbol from transition positions. The coarse estimate is `nominal` if given,
+    # else the shortest well-populated edge interval ("histogram") or the lowest strong line of
+    # the edge train's spectrum ("fft"); it is refined by least squares over all intervals taken
+    # as whole multiples of it, widening from single-symbol intervals so a coarse error cannot alias.
+    edges = np.asarray(edges, dtype=float)
+    intervals = np.diff(edges)
+    intervals = intervals[intervals >= min_period]
+    if intervals.size < 2:
+        raise ValueError("too few transitions to estimate the clock")
+    if nominal:
+        coarse = nominal
+    elif method == "histogram":
+        counts = np.bincount(np.rint(intervals).astype(np.intp))
+        shortest = int(np.flatnonzero(counts >= 0.25 * counts.max())[0])
+        coarse = float(np.mean(intervals[np.abs(intervals - shortest) <= max(1.0, 0.2 * shortest)]))
+    elif method == "fft":
+        positions = np.rint(edges - edges[0]).astype(np.intp)
+        positions = positions[positions < 1 << 22]
+        train = np.zeros(positions[-1] + 1)
+        train[positions] = 1.0
+        power = np.abs(np.fft.rfft(train - train.mean())) ** 2
+        top = min(int(train.size / min_period), power.size - 1)
+        if top < 1:
+            raise ValueError("too few transitions to estimate the clock")
+        band = power[1:top + 1]
+        line = int(np.flatnonzero(band >= 0.5 * band.max())[0]) + 1
+        coarse = train.size / line
+    else:
+        raise ValueError(f"Unknown period estimation method: {method}")
+
+    period = coarse
+    for limit in (1, 2, 4, 8, np.inf):
+        # intervals far from a whole number of symbols are edges the noise moved or added
+        multiples = np.rint(intervals / period)
+        keep = (multiples >= 1) & (multiples <= limit) & (np.abs(intervals / period - multiples) <= 0.25)
+        if keep.any():
+            period = float(intervals[keep].sum() / multiples[keep].sum())
+    return period
+
+
+class ClockRecovery:
+
+    # Streaming symbol timing for captures that start at an unknown phase and run at a rate
+    # off (or drifting around) the nominal one. The period is estimated once, from the first
+    # training_edges transitions (see _train). After that every transition gives a phase error
+    # against a grid of that period. A circular moving mean over `window` transitions follows
+    # drift and averages out jitter; the period error times the window should stay well under
+    # one symbol. Each symbol is read between the interpolated boundaries over the central
+    # `aperture` of its span (0: the one sample nearest the centre). Only the samples of symbols
+    # not yet emitted are buffered, and the output is a CompactWaveform at sampling_rate that
+    # the decoders take as is.
+
+    def __init__(self, scheme: str, sampling_rate: int = 100, samples_per_bit: Optional[float] = None,
+                 method: str = "histogram", window: int = 16, aperture: float = 0.5, min_period: float = 2.0,
+                 training_edges: int = 256):
+        if scheme not in DigitalSignalGenerator.SCHEMES:
+            raise ValueError(f"Unknown encoding scheme: {scheme}")
+        if method not in PERIOD_METHODS:
+            raise ValueError(f"Unknown period estimation method: {method}")
+        if not 0.0 <= aperture <= 1.0:
+            raise ValueError("aperture must be between 0 and 1")
+        self.scheme = scheme
+        self.symbols_per_bit = DigitalSignalGenerator.SCHEMES[scheme][1]
+        self.ternary = scheme in TERNARY_SCHEMES
+        self.sampling_rate = sampling_rate
+        self.method = method
+        self.window = max(window, 1)
+        self.aperture = aperture
+        self.min_period = min_period
+        # edge detection: moving mean width and the shortest run that is not a glitch, both
+        # scaled to the symbol period once it is known
+        self.smoothing = 1
+        self.min_run = max(int(min_period), 1)
+        self.training_edges = training_edges
+        # samples per symbol, estimated from the capture; samples_per_bit only seeds the estimate
+        self.nominal = samples_per_bit / self.symbols_per_bit if samples_per_bit else None
+        self.period = None
+        self.amplitude = None
+        # sample position of the first emitted bit boundary
+        self.offset = None
+        self.reset()
+
+    def reset(self) -> None:
+
+        # forget the stream position but keep period and amplitude for the next capture
+        self._pending = np.empty(0)
+        self._base = 0
+        self._scanned = 0
+        self._level = None
+        self._history = None
+        self._training_size = 0
+        self._edges_x = np.empty(0)
+        self._edges_z = np.empty(0, dtype=complex)
+        self._done = 0
+        self._point = None
+        self._next_symbol = None
+        self._trained = self.period is not None and self.amplitude is not None
+
+    @property
+    def samples_per_bit(self) -> Optional[float]:
+
+        return None if self.period is None else self.period * self.symbols_per_bit
+
+    def _train(self, final: bool) -> bool:
+
+        # amplitude and period from the start of the capture: the first TRAINING_SAMPLES
+        # samples, or fewer once they hold training_edges transitions
+        segment = self._pending[:TRAINING_SAMPLES]
+        if not final and segment.size < min(self.window, TRAINING_SAMPLES):
+            return False
+        amplitude = self.amplitude or estimate_amplitude(segment)
+        if self.period is None:
+            # the width search scans the segment several times, so it is only retried once
+            # the segment has doubled
+            if not final and segment.size < min(2 * self._training_size, TRAINING_SAMPLES):
+                return False
+            self._training_size = segment.size
+            found = self._coarse_period(segment, amplitude)
+            if found is None:
+                if not final and segment.size < TRAINING_SAMPLES:
+                    return False
+                raise ValueError("too few transitions to estimate the clock")
+            edges, width = found
+            if not final and edges.size < self.training_edges and segment.size < TRAINING_SAMPLES:
+                return False
+            self.period = estimate_period(edges, self.method, max(self.min_period, 2 * width), self.nominal)
+            if not self.amplitude:
+                # the smoothed signal no longer lifts the amplitude by the noise
+                amplitude = estimate_amplitude(moving_average(segment, width))
+        self.amplitude = amplitude
+        self.smoothing = max(int(self.period * SMOOTHING_FRACTION), 1)
+        self.min_run = max(int(self.period * GLITCH_FRACTION), int(self.min_period), 1)
+        self._trained = True
+        return True
+
+    def _edge_delay(self) -> int:
+
+        # samples the moving mean needs to carry a step past the slicer threshold, from the
+        # dead band to a level (0.65 of the step, ternary) or across it (0.625, binary)
+        return int(np.floor((0.65 if self.ternary else 0.625) * self.smoothing))
+
+    def _coarse_period(self, segment: np.ndarray, amplitude: float) -> Optional[Tuple[np.ndarray, int]]:
+
+        # (edges, moving mean width) for the training segment. Noise splits the levels into
+        # short runs, so widths 1, 2, 4, ... are tried and the widest one whose period
+        # estimate still spans 1 / SMOOTHING_FRACTION widths is kept; a nominal rate picks
+        # the width directly
+        if self.nominal:
+            widths = [max(int(self.nominal * SMOOTHING_FRACTION), 1)]
+        else:
+            widths = [1 << k for k in range(max(int(np.log2(max(segment.size, 2))) - 2, 1))]
+        found = None
+        for width in widths:
+            min_run = max(2 * width, int(self.min_period), 1)
+            smoothed = moving_average(segment, width)
+            edges = detect_edges(smoothed, amplitude, self.ternary, None, min_run)[0]
+            try:
+                period = estimate_period(edges, self.method, min_run, self.nominal)
+            except ValueError:
+                period = 0.0
+            if self.nominal or period * SMOOTHING_FRACTION >= width:
+                found = edges, width
+            elif found is not None:
+                break
+        return found
+
+    def feed(self, chunk: np.ndarray) -> CompactWaveform:
+
+        chunk = np.asarray(chunk, dtype=float).reshape(-1)
+        self._pending = np.concatenate([self._pending, chunk]) if self._pending.size else chunk
+        if not self._trained and not self._train(final=False):
+            return self._empty()
+        return self._process(final=False)
+
+    def flush(self) -> CompactWaveform:
+
+        if not self._trained:
+            if not self._pending.size:
+                return self._empty()
+            self._train(final=True)
+        waveform = self._process(final=True)
+        self.reset()
+        return waveform
+
+    def stream(self, source, chunk_samples: int = 1 << 16) -> Iterator[CompactWaveform]:
+
+        # source: one array (read chunk_samples at a time, so memmaps stay on disk) or any
+        # iterable of sample chunks; empty results are skipped
+        if isinstance(source, np.ndarray):
+            chunks = (source[start:start + chunk_samples] for start in range(0, source.shape[-1], chunk_samples))
+        else:
+            chunks = source
+        for chunk in chunks:
+            waveform = self.feed(chunk)
+            if waveform.levels.size:
+                yield waveform
+        waveform = self.flush()
+        if waveform.levels.size:
+            yield waveform
+
+    def _empty(self) -> CompactWaveform:
+
+        return CompactWaveform(np.empty(0, dtype=np.int8), self.symbols_per_bit, self.sampling_rate)
+
+    def _control_points(self, final: bool) -> Tuple[np.ndarray, np.ndarray]:
+
+        # (symbol index, unwrapped phase error in symbols) for every transition whose moving
+        # window is complete; the window is truncated at the ends of the capture
+        new = self._pending[self._scanned - self._base:]
+        smoothed = moving_average(new, self.smoothing, self._history)
+        if self.smoothing > 1 and new.size:
+            history = self._history if self._history is not None else np.full(self.smoothing - 1, new[0])
+            self._history = np.concatenate([history, new])[-(self.smoothing - 1):]
+        edges, self._level = detect_edges(smoothed, self.amplitude, self.ternary, self._level, self.min_run)
+        self._scanned += new.size
+        x = (edges + (self._scanned - new.size) - self._edge_delay()) / self.period
+        all_x = np.concatenate([self._edges_x, x])
+        all_z = np.concatenate([self._edges_z, np.exp(2j * np.pi * x)])
+        half = self.window // 2
+        stop = all_x.size if final else max(all_x.size - half, self._done)
+        ready = np.arange(self._done, stop)
+        sums = np.concatenate([[0], np.cumsum(all_z)])
+        phase = np.angle(sums[np.minimum(ready + half + 1, all_x.size)] - sums[np.maximum(ready - half, 0)])
+        if self._point is not None:
+            phase = np.unwrap(np.concatenate([[2 * np.pi * self._point[1]], phase]))[1:]
+        else:
+            phase = np.unwrap(phase)
+        keep = max(all_x.size - 2 * half, 0)
+        self._edges_x, self._edges_z = all_x[keep:], all_z[keep:]
+        self._done = max(stop - keep, 0)
+        phase /= 2 * np.pi
+        return all_x[ready] - phase, phase
+
+    def _process(self, final: bool) -> CompactWaveform:
+
+        # symbol k spans (k + u(k)) * period to (k + 1 + u(k + 1)) * period samples, with the
+        # phase error u interpolated between transitions
+        points_s, points_u = self._control_points(final)
+        if self._point is not None:
+            points_s = np.concatenate([[self._point[0]], points_s])
+            points_u = np.concatenate([[self._point[1]], points_u])
+        if not points_s.size:
+            if not final and self._pending.size < MAX_HOLD_SAMPLES:
+                return self._empty()
+            # no transition at all: hold the phase found so far (or zero)
+            points_s, points_u = np.zeros(1), np.zeros(1)
+        if self._next_symbol is None:
+            self._next_symbol = self._first_symbol(points_s, points_u)
+            self.offset = float((self._next_symbol + np.interp(self._next_symbol, points_s, points_u)) * self.period)
+        self._point = (points_s[-1], points_u[-1])
+
+        end = self._base + self._pending.size
+        if final:
+            # a trailing symbol with at least half of its samples present still counts
+            last = int(np.floor(end / self.period - points_u[-1] + 0.5))
+        else:
+            # symbols past the last transition wait for the next chunk unless held too long
+            limit = max(points_s[-1], (end - MAX_HOLD_SAMPLES // 2) / self.period - points_u[-1])
+            last = min(int(np.floor(limit)), int(np.floor(end / self.period - points_u[-1])) - 1)
+        count = max(last - self._next_symbol, 0)
+        count -= count % self.symbols_per_bit
+        if not count:
+            return self._empty()
+
+        symbols = np.arange(self._next_symbol, self._next_symbol + count + 1, dtype=float)
+        boundaries = (symbols + np.interp(symbols, points_s, points_u)) * self.period
+        levels = self._symbol_levels(boundaries)
+        self._next_symbol += count
+        drop = min(max(int(np.floor(boundaries[-1])) - 1 - self._base, 0), self._pending.size)
+        self._pending = self._pending[drop:]
+        self._base += drop
+        return CompactWaveform(levels, self.symbols_per_bit, self.sampling_rate)
+
+    def _first_symbol(self, points_s: np.ndarray, points_u: np.ndarray) -> int:
+
+        # the first symbol with at least half of its samples in the capture; the Manchester
+        # codes also start on a bit, i.e. right after a grid point without a guaranteed transition
+        first = int(np.ceil(-0.5 - points_u[0]))
+        if self.symbols_per_bit == 2:
+            symbols = np.rint(points_s).astype(np.int64)
+            mid_bit = int(np.count_nonzero(symbols % 2) * 2 > symbols.size)
+            first += (first - mid_bit - 1) % 2
+        return first
+
+    def _symbol_levels(self, boundaries: np.ndarray) -> np.ndarray:
+
+        # mean over the central aperture of each symbol (sample i covers [i, i + 1)), sliced
+        starts, stops = boundaries[:-1] - self._base, boundaries[1:] - self._base
+        margin = (1 - self.aperture) / 2 * (stops - starts)
+        centre = np.floor((starts + stops) / 2)
+        first = np.minimum(np.ceil(starts + margin - 0.5), centre)
+        last = np.maximum(np.floor(stops - margin - 0.5), centre)
+        first = np.clip(first, 0, self._pending.size - 1).astype(np.intp)
+        last = np.clip(last, first, self._pending.size - 1).astype(np.intp)
+        sums = np.concatenate([[0.0], np.cumsum(self._pending)])
+        values = (sums[last + 1] - sums[first]) / (last + 1 - first)
+        if self.ternary:
+            return np.rint(np.clip(values / self.amplitude, -1, 1)).astype(np.int8)
+        return np.where(values >= 0, 1, -1).astype(np.int8)
+
+
+def recover_clock(signal: np.ndarray, scheme: str, sampling_rate: int = 100, **options) -> CompactWaveform:
+
+    # one-shot ClockRecovery over a whole capture; options are passed to ClockRecovery
+    recovery = ClockRecovery(scheme, sampling_rate, **options)
+    levels = [waveform.levels for waveform in recovery.stream(signal)]
+    levels = np.concatenate(levels) if levels else np.empty(0, dtype=np.int8)
+    return CompactWaveform(levels, recovery.symbols_per_bit, sampling_rate)
@@ -0,0 +1,110 @@
+import numpy as np
+
+from typing import Optional, Tuple
+
+
+def time_axis(n_bits: int, symbols_per_bit: int, sampling_rate: int, bit_offset: int = 0) -> np.ndarray:
+
+    # each symbol is held for sampling_rate // symbols_per_bit samples, with the same
+    # sample times as the per-bit np.linspace(i, i + 1, ..., endpoint=False)
+    samples_per_symbol = sampling_rate // symbols_per_bit
+    step = (1.0 / symbols_per_bit) / max(samples_per_symbol, 1)
+    symbols = np.arange(n_bits * symbols_per_bit) + bit_offset * symbols_per_bit
+    return (symbols[:, None] / symbols_per_bit + np.arange(samples_per_symbol) * step).ravel()
+
+
+def expand_levels(levels: np.ndarray, sampling_rate: int, bit_offset: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+
+    # levels has shape (..., n_bits, symbols_per_bit)
+    n_bits, symbols_per_bit = levels.shape[-2:]
+    flat = levels.reshape(levels.shape[:-2] + (n_bits * symbols_per_bit,)).astype(np.int_)
+    return (time_axis(n_bits, symbols_per_bit, sampling_rate, bit_offset),
+            np.repeat(flat, sampling_rate // symbols_per_bit, axis=-1))
+
+
+class CompactWaveform:
+
+    # One int8 level per symbol (a bit, or a half bit for the Manchester codes) instead of
+    # sampling_rate dense samples. Dense (time, signal) arrays are only built by expand();
+    # mean/std follow the numpy method protocol, so np.mean(waveform) works without expanding.
+
+    def __init__(self, levels: np.ndarray, symbols_per_bit: int, sampling_rate: int,
+                 bit_duration: float = 1.0, bit_offset: int = 0):
+        self.levels = np.asarray(levels, dtype=np.int8)
+        self.symbols_per_bit = symbols_per_bit
+        self.sampling_rate = sampling_rate
+        self.bit_duration = bit_duration
+        self.bit_offset = bit_offset
+
+    @property
+    def n_bits(self) -> int:
+
+        return self.levels.size // self.symbols_per_bit
+
+    @property
+    def samples_per_symbol(self) -> int:
+
+        return self.sampling_rate // self.symbols_per_bit
+
+    @property
+    def nbytes(self) -> int:
+
+        return self.levels.nbytes
+
+    def __len__(self) -> int:
+
+        return self.levels.size * self.samples_per_symbol
+
+    def __repr__(self) -> str:
+
+        return (f"CompactWaveform(n_bits={self.n_bits}, symbols_per_bit={self.symbols_per_bit}, "
+                f"sampling_rate={self.sampling_rate})")
+
+    def bit_levels(self) -> np.ndarray:
+
+        return self.levels.reshape(self.n_bits, self.symbols_per_bit)
+
+    def window(self, start_bit: int = 0, stop_bit: Optional[int] = None) -> "CompactWaveform":
+
+        start, stop, _ = slice(start_bit, stop_bit).indices(self.n_bits)
+        stop = max(start, stop)
+        levels = self.levels[start * self.symbols_per_bit:stop * self.symbols_per_bit]
+        return CompactWaveform(levels, self.symbols_per_bit, self.sampling_rate, self.bit_duration,
+                               self.bit_offset + start)
+
+    def expand(self, start_bit: int = 0, stop_bit: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+
+        part = self.window(start_bit, stop_bit)
+        return expand_levels(part.bit_levels(), self.sampling_rate, part.bit_offset)
+
+    def edges(self, start_bit: int = 0, stop_bit: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+
+        # square wave as step corners: two points per level change plus the two end points
+        part = self.window(start_bit, stop_bit)
+        if not part.levels.size:
+            return np.empty(0), np.empty(0)
+        levels = part.levels
+        change = np.flatnonzero(levels[1:] != levels[:-1]) + 1
+        x = np.concatenate([[0], np.repeat(change, 2), [levels.size]]) / self.symbols_per_bit + part.bit_offset
+        y = np.concatenate([[levels[0]], np.column_stack([levels[change - 1], levels[change]]).ravel(),
+                            [levels[-1]]])
+        return x, y
+
+    def __array__(self, dtype=None, copy=None):
+
+        signal = self.expand()[1]
+        return signal if dtype is None else signal.astype(dtype)
+
+    def mean(self, axis=None, dtype=None, out=None, **kwargs):
+
+        # every symbol covers the same number of samples, so symbol and sample statistics agree
+        return np.mean(self.levels, axis=axis, dtype=dtype or np.float64, out=out, **kwargs)
+
+    def std(self, axis=None, dtype=None, out=None, ddof=0, **kwargs):
+
+        # accumulate squared deviations in blocks so no float copy of all levels is made
+        mean, squares = self.mean(), 0.0
+        for start in range(0, self.levels.size, 1 << 20):
+            deviation = self.levels[start:start + (1 << 20)] - mean
+            squares += np.dot(deviation, deviation)
+        return np.sqrt(squares * self.samples_per_symbol / max(len(self) - ddof, 0))
@@ -1,239 +1,1006 @@
+import itertools
+import os
+
 import numpy as np
 
-from typing import List, Tuple
+from array import array
+from typing import Iterator, List, Optional, Tuple
+
+from analogsource import AnalogSource
+from bitbuffer import BYTES_LIKE, BitBuffer, as_bits
+from compactwaveform import CompactWaveform, expand_levels, time_axis
+from instrumentation import Instrumentation, instrumented
+from resultcache import ResultCache, fingerprint
+
+
+_COMPILED_KERNELS = {}
+
+
+def _compiled(kernel):
+
+    # numba is optional and imported on first use only, so importing this module stays cheap
+    if kernel not in _COMPILED_KERNELS:
+        try:
+            import numba
+        except ImportError:
+            _COMPILED_KERNELS[kernel] = None
+        else:
+            _COMPILED_KERNELS[kernel] = numba.njit(cache=True)(kernel)
+    return _COMPILED_KERNELS[kernel]
+
+
+def _delta_modulation_kernel(samples, bits, staircase, approximation, step):
+
+    # bits arrives zeroed, so only the ones are written
+    for i, sample in enumerate(samples):
+        if sample > approximation:
+            bits[i] = 1
+            approximation += step
+        else:
+            approximation -= step
+        staircase[i] = approximation
+    return approximation
+
+
+def _adaptive_delta_kernel(samples, bits, staircase, approximation, step, run, last_bit,
+                           step_min, step_max, growth, run_length):
+
+    for i, sample in enumerate(samples):
+        bit = 1 if sample > approximation else 0
+        run = run + 1 if bit == last_bit else 1
+        last_bit = bit
+        if run >= run_length:
+            step = min(step * growth, step_max)
+        else:
+            step = max(step / growth, step_min)
+        approximation += step if bit else -step
+        bits[i] = bit
+        staircase[i] = approximation
+    return approximation, step, run, last_bit
+
+
+def _adaptive_delta_demodulation_kernel(samples, bits, staircase, approximation, step, run, last_bit,
+                                        step_min, step_max, growth, run_length):
+
+    for i, sample in enumerate(samples):
+        bit = 1 if sample > 0.5 else 0
+        run = run + 1 if bit == last_bit else 1
+        last_bit = bit
+        if run >= run_length:
+            step = min(step * growth, step_max)
+        else:
+            step = max(step / growth, step_min)
+        approximation += step if bit else -step
+        bits[i] = bit
+        staircase[i] = approximation
+    return approximation, step, run, last_bit
 
 
-class DigitalSignalGenerator:
+def _manacher_kernel(symbols, odd, even):
 
+    # plain comparisons instead of min() keep the pure-Python fallback fast as well
+    n = len(symbols)
+    left, right = 0, -1
+    for i in range(n):
+        if i > right:
+            k = 1
+        else:
+            k = odd[left + right - i]
+            if k > right - i + 1:
+                k = right - i + 1
+        while i - k >= 0 and i + k < n and symbols[i - k] == symbols[i + k]:
+            k += 1
+        odd[i] = k
+        if i + k - 1 > right:
+            left, right = i - k + 1, i + k - 1
+    left, right = 0, -1
+    for i in range(n):
+        if i > right:
+            k = 0
+        else:
+            k = even[left + right - i + 1]
+            if k > right - i + 1:
+                k = right - i + 1
+        while i - k - 1 >= 0 and i + k < n and symbols[i - k - 1] == symbols[i + k]:
+            k += 1
+        even[i] = k
+        if i + k - 1 > right:
+            left, right = i - k, i + k - 1
 
-    def __init__(self):
-        self.bit_duration = 1.0
-        self.sampling_rate = 100
 
+def _encode_rows_into(out: np.ndarray, scheme: str, sampling_rate: int, jobs) -> None:
 
-    def pcm_encode(self, analog_signal: np.ndarray, n_bits: int = 8) -> str:
+    generator = DigitalSignalGenerator(cache_bytes=0)
+    generator.sampling_rate = sampling_rate
+    samples_per_symbol = sampling_rate // generator.SCHEMES[scheme][1]
+    for offset, bits in jobs:
+        levels = generator._encode_levels(scheme, bits, {}).reshape(-1)
+        out[offset:offset + levels.size * samples_per_symbol] = np.repeat(levels, samples_per_symbol)
+
+
+def _encode_packed_into_shared(name: str, n_samples: int, scheme: str, sampling_rate: int, jobs) -> None:
+
+    from multiprocessing import shared_memory
+
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        out = np.ndarray((n_samples,), dtype=np.int8, buffer=block.buf)
+        _encode_rows_into(out, scheme, sampling_rate,
+                          [(offset, np.unpackbits(packed, count=n_bits).view(bool)) for offset, packed, n_bits in jobs])
+        del out
+    finally:
+        block.close()
+
+
+class LazyPalindrome:
+
+    # Deferred longest_palindrome_manacher result: nothing runs until the palindrome, its
+    # start/length or the (palindrome, start, length) tuple is actually read.
+
+    def __init__(self, compute):
+        self._compute = compute
+        self._result = None
 
-        if len(analog_signal) < 2:
-            raise ValueError("Signal needs at least 2 samples")
-        normalized = (analog_signal - np.min(analog_signal)) / (np.max(analog_signal) - np.min(analog_signal) + 1e-10)
-        levels = 2 ** n_bits
-        quantized = np.floor(normalized * (levels - 1)).astype(int)
-        return ''.join([format(val, f'0{n_bits}b') for val in quantized])
+    @property
+    def result(self) -> Tuple[str, int, int]:
+
+        if self._result is None:
+            self._result = self._compute()
+        return self._result
+
+    @property
+    def palindrome(self) -> str:
 
-    def delta_modulation(self, analog_signal: np.ndarray, step_size: float = 0.1) -> str:
+        return self.result[0]
 
-        binary_output = []
-        approximation = analog_signal[0]
-        for sample in analog_signal:
-            if sample > approximation:
-                binary_output.append('1')
-                approximation += step_size
-            else:
-                binary_output.append('0')
-                approximation -= step_size
-        return ''.join(binary_output)
+    @property
+    def start(self) -> int:
 
+        return self.result[1]
 
-    def longest_palindrome_manacher(self, data_stream: str) -> Tuple[str, int, int]:
+    @property
+    def length(self) -> int:
 
-        if not data_stream:
-            return "", 0, 0
+        return self.result[2]
 
-        t = '#'.join('^{}$'.format(data_stream))
-        n = len(t)
-        P = [0] * n
-        center = right = 0
+    def __iter__(self):
 
-        for i in range(1, n - 1):
-            mirror = 2 * center - i
-            if i < right:
-                P[i] = min(right - i, P[mirror])
+        return iter(self.result)
 
-            try:
-                while t[i + 1 + P[i]] == t[i - 1 - P[i]]:
-                    P[i] += 1
-            except IndexError:
-                pass
 
-            if i + P[i] > right:
-                center, right = i, i + P[i]
+class DigitalSignalGenerator:
 
-        max_len = max(P) if P else 0
-        if max_len == 0:
-            return "", 0, 0
 
-        center_idx = P.index(max_len)
-        start = (center_idx - max_len) // 2
-        palindrome = data_stream[start:start + max_len]
-        return palindrome, start, max_len
-
-
-    def nrz_l(self, data: str) -> Tuple[np.ndarray, np.ndarray]:
-
-        signal, time = [], []
-        for i, bit in enumerate(data):
-            t = np.linspace(i, i + 1, self.sampling_rate, endpoint=False)
-            v = 1 if bit == '1' else -1
-            signal.extend([v] * len(t))
-            time.extend(t)
-        return np.array(time), np.array(signal)
-
-    def nrz_i(self, data: str) -> Tuple[np.ndarray, np.ndarray]:
-
-        signal, time, level = [], [], -1
-        for i, bit in enumerate(data):
-            t = np.linspace(i, i + 1, self.sampling_rate, endpoint=False)
-            if bit == '1':
-                level *= -1
-            signal.extend([level] * len(t))
-            time.extend(t)
-        return np.array(time), np.array(signal)
-
-    def manchester(self, data: str) -> Tuple[np.ndarray, np.ndarray]:
-
-        signal, time = [], []
-        for i, bit in enumerate(data):
-            t1 = np.linspace(i, i + 0.5, self.sampling_rate // 2, endpoint=False)
-            t2 = np.linspace(i + 0.5, i + 1, self.sampling_rate // 2, endpoint=False)
-            if bit == '1':
-                signal.extend([-1] * len(t1) + [1] * len(t2))
+    # scheme registry: name -> (display name, symbols per bit); encode(), encode_batch(),
+    # decode_bits() and the GUI all dispatch on these names
+    SCHEMES = {
+        "nrz_l": ("NRZ-L", 1),
+        "nrz_i": ("NRZ-I", 1),
+        "manchester": ("Manchester", 2),
+        "diff_manchester": ("Differential Manchester", 2),
+        "ami": ("AMI", 1),
+        "b8zs": ("AMI (B8ZS)", 1),
+        "hdb3": ("AMI (HDB3)", 1),
+    }
+    SCRAMBLING_BLOCKS = {"b8zs": 8, "hdb3": 4}
+
+    def __init__(self, cache_bytes: int = 64 << 20):
+        self.bit_duration = 1.0
+        self.sampling_rate = 100
+        # results of encode/decode/scrambling/analysis, keyed on their inputs and the
+        # parameters above; see cache.stats() for hit/miss counts
+        self.cache = ResultCache(cache_bytes)
+        # per-stage timing; off until sinks are attached (see instrumentation.py)
+        self.instrumentation = Instrumentation()
+
+    def _cached(self, kind: str, compute, *parts):
+
+        # inputs larger than the whole budget cost more to fingerprint than they are likely to save
+        if not self.cache.max_bytes or any(isinstance(part, np.ndarray) and part.nbytes > self.cache.max_bytes
+                                           for part in parts):
+            return compute()
+        key = fingerprint(kind, self.sampling_rate, self.bit_duration, *parts)
+        return self.cache.get(key, compute)
+
+
+    def _compand(self, normalized: np.ndarray, companding: str, mu: float, a: float,
+                 inverse: bool = False) -> np.ndarray:
+
+        # mu-law / A-law act on [-1, 1]; normalized samples live in [0, 1]
+        x = 2 * normalized - 1
+        magnitude = np.abs(x)
+        if companding == "mu":
+            if inverse:
+                y = np.expm1(magnitude * np.log1p(mu)) / mu
             else:
-                signal.extend([1] * len(t1) + [-1] * len(t2))
-            time.extend(list(t1) + list(t2))
-        return np.array(time), np.array(signal)
-
-    def differential_manchester(self, data: str) -> Tuple[np.ndarray, np.ndarray]:
-
-        signal, time, level = [], [], 1
-        for i, bit in enumerate(data):
-            t1 = np.linspace(i, i + 0.5, self.sampling_rate // 2, endpoint=False)
-            t2 = np.linspace(i + 0.5, i + 1, self.sampling_rate // 2, endpoint=False)
-            if bit == '0':
-                level *= -1
-            signal.extend([level] * len(t1))
-            level *= -1
-            signal.extend([level] * len(t2))
-            time.extend(list(t1) + list(t2))
-        return np.array(time), np.array(signal)
-
-    def ami(self, data: str) -> Tuple[np.ndarray, np.ndarray]:
-
-        signal, time, last_one = [], [], -1
-        for i, bit in enumerate(data):
-            t = np.linspace(i, i + 1, self.sampling_rate, endpoint=False)
-            if bit == '0':
-                v = 0
+                y = np.log1p(mu * magnitude) / np.log1p(mu)
+        elif companding == "a":
+            scale = 1 + np.log(a)
+            if inverse:
+                y = np.where(magnitude < 1 / scale, magnitude * scale / a, np.exp(magnitude * scale - 1) / a)
             else:
-                last_one *= -1
-                v = last_one
-            signal.extend([v] * len(t))
-            time.extend(t)
-        return np.array(time), np.array(signal)
+                y = np.where(magnitude < 1 / a, a * magnitude / scale,
+                             (1 + np.log(np.maximum(a * magnitude, 1))) / scale)
+        else:
+            raise ValueError(f"Unknown companding law: {companding}")
+        return (np.sign(x) * y + 1) / 2
+
+    def pcm_quantize(self, analog_signal: np.ndarray, n_bits: int = 8, vmin: Optional[float] = None,
+                     vmax: Optional[float] = None, companding: Optional[str] = None,
+                     mu: float = 255.0, a: float = 87.6) -> np.ndarray:
+
+        # without vmin/vmax every call normalizes to its own min/max; a fixed range quantizes
+        # separate chunks of one stream consistently
+        if not 1 <= n_bits <= 16:
+            raise ValueError("n_bits must be between 1 and 16")
+        analog_signal = np.asarray(analog_signal, dtype=float)
+        if vmin is None and vmax is None:
+            if len(analog_signal) < 2:
+                raise ValueError("Signal needs at least 2 samples")
+            low, high = np.min(analog_signal), np.max(analog_signal)
+            normalized = (analog_signal - low) / (high - low + 1e-10)
+        else:
+            if vmin is None or vmax is None or not vmin < vmax:
+                raise ValueError("vmin and vmax must both be given with vmin < vmax")
+            normalized = np.clip((analog_signal - vmin) / (vmax - vmin), 0.0, 1.0)
+        if companding is not None:
+            normalized = self._compand(normalized, companding, mu, a)
+        return np.floor(normalized * (2 ** n_bits - 1)).astype(np.uint16)
+
+    @instrumented("pcm_encode")
+    def pcm_encode(self, analog_signal: np.ndarray, n_bits: int = 8, packed: bool = False,
+                   vmin: Optional[float] = None, vmax: Optional[float] = None,
+                   companding: Optional[str] = None, mu: float = 255.0, a: float = 87.6):
+
+        return self._cached("pcm", lambda: self._pcm_encode(analog_signal, n_bits, packed, vmin, vmax,
+                                                            companding, mu, a),
+                            np.asarray(analog_signal, dtype=float), n_bits, packed, vmin, vmax, companding, mu, a)
+
+    def _pcm_encode(self, analog_signal: np.ndarray, n_bits: int, packed: bool, vmin: Optional[float],
+                    vmax: Optional[float], companding: Optional[str], mu: float, a: float):
+
+        quantized = self.pcm_quantize(analog_signal, n_bits, vmin, vmax, companding, mu, a)
+        # big-endian uint16 bytes unpack MSB first; keep the low n_bits of each code word
+        bits = np.unpackbits(quantized.astype('>u2').view(np.uint8).reshape(-1, 2), axis=1)[:, 16 - n_bits:]
+        if packed:
+            return BitBuffer.from_bits(bits.ravel())
+        return (bits.ravel() + ord('0')).tobytes().decode('ascii')
+
+    def pcm_encode_stream(self, source, n_bits: int = 8, vmin: Optional[float] = None, vmax: Optional[float] = None,
+                          companding: Optional[str] = None, mu: float = 255.0, a: float = 87.6,
+                          chunk_size: int = 1 << 16) -> Iterator[BitBuffer]:
+
+        # chunked pcm_encode(packed=True) of an array, memmap or analogsource.AnalogSource, read
+        # chunk_size samples at a time, or of any iterable of sample chunks. A stream has no global
+        # min/max, so the range is fixed: vmin/vmax, else the source's bounds. Chunks bypass the
+        # result cache.
+        if vmin is None and vmax is None:
+            if not hasattr(source, "bounds"):
+                raise ValueError("streamed PCM needs vmin and vmax, or a source with bounds")
+            vmin, vmax = source.bounds
+        for chunk in self._iter_samples(source, chunk_size):
+            with self.instrumentation.stage("pcm_encode", len(chunk)):
+                bits = self._pcm_encode(chunk, n_bits, True, vmin, vmax, companding, mu, a)
+            yield bits
+
+    def pcm_decode(self, data, n_bits: int = 8, vmin: float = 0.0, vmax: float = 1.0,
+                   companding: Optional[str] = None, mu: float = 255.0, a: float = 87.6) -> np.ndarray:
+
+        bits = self._bit_array(data)
+        bits = bits[:bits.size // n_bits * n_bits].reshape(-1, n_bits)
+        codes = bits.astype(np.uint32) @ (1 << np.arange(n_bits - 1, -1, -1, dtype=np.uint32))
+        normalized = codes / (2 ** n_bits - 1)
+        if companding is not None:
+            normalized = self._compand(normalized, companding, mu, a, inverse=True)
+        return vmin + normalized * (vmax - vmin)
+
+    def _run_kernel(self, kernel, samples: np.ndarray, *args):
+
+        # compiled kernels work on arrays; the Python fallback is faster on lists and bytearrays
+        compiled = _compiled(kernel)
+        n = len(samples)
+        if compiled is not None:
+            bits, staircase = np.zeros(n, dtype=np.uint8), np.empty(n)
+            state = compiled(np.ascontiguousarray(samples, dtype=float), bits, staircase, *args)
+            return bits.view(bool), staircase, state
+        bits, staircase = bytearray(n), [0.0] * n
+        state = kernel(np.asarray(samples, dtype=float).tolist(), bits, staircase, *args)
+        return np.frombuffer(bits, dtype=np.uint8).view(bool), np.array(staircase), state
+
+    @instrumented("delta_modulate")
+    def delta_modulate(self, analog_signal: np.ndarray, step_size: float = 0.1,
+                       state: Optional[dict] = None) -> Tuple[BitBuffer, np.ndarray]:
+
+        # returns the bits and the staircase approximation after each sample; pass the same
+        # state dict to consecutive calls to modulate a signal chunk by chunk
+        state = {} if state is None else state
+        if not len(analog_signal):
+            return BitBuffer.from_bits(np.empty(0, dtype=bool)), np.empty(0)
+        approximation = state.get("approximation", float(analog_signal[0]))
+        bits, staircase, state["approximation"] = self._run_kernel(
+            _delta_modulation_kernel, analog_signal, approximation, step_size)
+        return BitBuffer.from_bits(bits), staircase
+
+    def delta_modulation(self, analog_signal: np.ndarray, step_size: float = 0.1, packed: bool = False,
+                         state: Optional[dict] = None):
+
+        def compute():
+
+            bits, _ = self.delta_modulate(analog_signal, step_size, state)
+            return bits if packed else bits.to_str()
+
+        # a chunk's bits depend on the state carried in from earlier chunks, so only
+        # stateless calls are cached
+        if state is not None:
+            return compute()
+        return self._cached("dm", compute, np.asarray(analog_signal, dtype=float), step_size, packed)
+
+    def delta_modulation_stream(self, source, step_size: float = 0.1, chunk_size: int = 1 << 16,
+                                state: Optional[dict] = None) -> Iterator[BitBuffer]:
+
+        # chunked delta_modulate carrying the staircase across chunks, read like
+        # pcm_encode_stream; the joined bits equal one call on the whole signal
+        state = {} if state is None else state
+        for chunk in self._iter_samples(source, chunk_size):
+            yield self.delta_modulate(chunk, step_size, state)[0]
+
+    def delta_demodulate(self, data, step_size: float = 0.1, initial: float = 0.0) -> np.ndarray:
+
+        steps = np.where(self._bit_array(data), step_size, -step_size)
+        return np.cumsum(np.concatenate([[initial], steps]))[1:]
+
+    @instrumented("adaptive_delta_modulate")
+    def adaptive_delta_modulate(self, analog_signal: np.ndarray, step_min: float = 0.01, step_max: float = 1.0,
+                                growth: float = 1.5, run_length: int = 3,
+                                state: Optional[dict] = None) -> Tuple[BitBuffer, np.ndarray]:
+
+        # CVSD-style: the step grows by `growth` while the last run_length bits agree (slope
+        # overload) and shrinks otherwise, clamped to [step_min, step_max]
+        state = {} if state is None else state
+        if not len(analog_signal):
+            return BitBuffer.from_bits(np.empty(0, dtype=bool)), np.empty(0)
+        bits, staircase, adapted = self._run_kernel(
+            _adaptive_delta_kernel, analog_signal, state.get("approximation", float(analog_signal[0])),
+            state.get("step", step_min), state.get("run", 0), state.get("last_bit", -1),
+            step_min, step_max, growth, run_length)
+        state["approximation"], state["step"], state["run"], state["last_bit"] = adapted
+        return BitBuffer.from_bits(bits), staircase
+
+    def adaptive_delta_demodulate(self, data, step_min: float = 0.01, step_max: float = 1.0,
+                                  growth: float = 1.5, run_length: int = 3, initial: float = 0.0) -> np.ndarray:
+
+        # the step sequence depends only on the bits, so the receiver replays the adaptation
+        bits = self._bit_array(data)
+        _, staircase, _ = self._run_kernel(
+            _adaptive_delta_demodulation_kernel, bits.view(np.uint8), initial, step_min, 0, -1,
+            step_min, step_max, growth, run_length)
+        return staircase
+
+    def snr_db(self, reference: np.ndarray, reconstruction: np.ndarray) -> float:
+
+        reference = np.asarray(reference, dtype=float)
+        error = reference - np.asarray(reconstruction, dtype=float)
+        return float(10 * np.log10(np.sum(reference ** 2) / max(np.sum(error ** 2), 1e-300)))
+
+    def _symbol_codes(self, data_stream) -> np.ndarray:
+
+        if isinstance(data_stream, str):
+            if data_stream.isascii():
+                return np.frombuffer(data_stream.encode('ascii'), dtype=np.uint8)
+            return np.frombuffer(data_stream.encode('utf-32-le'), dtype=np.uint32)
+        return self._bit_array(data_stream).view(np.uint8)
+
+    def _palindrome_in(self, codes: np.ndarray) -> Tuple[int, int]:
+
+        # radii come from Manacher's odd/even passes over the symbols themselves; laying them
+        # out as lengths[2i] = even palindrome before i, lengths[2i + 1] = odd one at i gives
+        # the centre order of the classic '^#a#b#$' string, so argmax picks the same palindrome
+        n = codes.size
+        if not n:
+            return 0, 0
+        compiled = _compiled(_manacher_kernel)
+        if compiled is not None:
+            odd, even = np.zeros(n, dtype=np.int64), np.zeros(n, dtype=np.int64)
+            compiled(np.ascontiguousarray(codes), odd, even)
+        else:
+            odd, even = array('q', bytes(8 * n)), array('q', bytes(8 * n))
+            _manacher_kernel(codes.tobytes() if codes.dtype == np.uint8 else codes.tolist(), odd, even)
+            odd, even = np.frombuffer(odd, dtype=np.int64), np.frombuffer(even, dtype=np.int64)
+        lengths = np.empty(2 * n, dtype=np.int64)
+        lengths[0::2] = 2 * even
+        lengths[1::2] = 2 * odd - 1
+        center = int(np.argmax(lengths))
+        max_len = int(lengths[center])
+        return (center + 1 - max_len) // 2, max_len
+
+    def longest_palindrome_manacher(self, data_stream, lazy: bool = False):
+
+        # lazy=True returns a LazyPalindrome that runs the analysis when first read
+        if lazy:
+            return LazyPalindrome(lambda: self.longest_palindrome_manacher(data_stream))
+        return self._cached("palindrome", lambda: self._longest_palindrome(data_stream),
+                            data_stream if isinstance(data_stream, str) else self._bit_array(data_stream))
+
+    @instrumented("palindrome")
+    def _longest_palindrome(self, data_stream) -> Tuple[str, int, int]:
+
+        start, max_len = self._palindrome_in(self._symbol_codes(data_stream))
+        if max_len == 0:
+            return "", 0, 0
+        if not isinstance(data_stream, str):
+            data_stream = BitBuffer.coerce(data_stream)[start:start + max_len].to_str()
+            return data_stream, start, max_len
+        return data_stream[start:start + max_len], start, max_len
+
+    def palindrome_windows(self, source, window: int) -> Iterator[Tuple[int, int, int]]:
+
+        # longest palindrome per consecutive window of `window` bits (the last one may be
+        # shorter) as (window_start, palindrome_start, length), with absolute bit positions
+        if window < 1:
+            raise ValueError("window must be at least 1 bit")
+        pending, offset = np.empty(0, dtype=bool), 0
+        for chunk in self._iter_chunks(source, window):
+            pending = np.concatenate([pending, self._bit_array(chunk)])
+            while pending.size >= window:
+                start, length = self._palindrome_in(pending[:window].view(np.uint8))
+                yield offset, offset + start, length
+                pending, offset = pending[window:], offset + window
+        if pending.size:
+            start, length = self._palindrome_in(pending.view(np.uint8))
+            yield offset, offset + start, length
 
+    def _bit_array(self, data) -> np.ndarray:
 
-    def decode_nrz_l(self, signal: np.ndarray) -> str:
+        return as_bits(data)
 
-        bits = []
-        samples_per_bit = self.sampling_rate
-        for i in range(0, len(signal), samples_per_bit):
-            bit_signal = signal[i:i + samples_per_bit]
-            if len(bit_signal) < samples_per_bit // 2:
-                break
-            avg_voltage = np.mean(bit_signal)
-            bits.append('1' if avg_voltage > 0 else '0')
-        return ''.join(bits)
+    def _waveform(self, levels: np.ndarray, bit_offset: int = 0, compact: bool = False):
 
-    def decode_nrz_i(self, signal: np.ndarray) -> str:
+        if compact:
+            return CompactWaveform(levels.reshape(-1), levels.shape[-1], self.sampling_rate,
+                                   self.bit_duration, bit_offset)
+        return expand_levels(levels, self.sampling_rate, bit_offset)
+
+    def _nrz_l_levels(self, bits: np.ndarray) -> np.ndarray:
 
-        bits = []
-        samples_per_bit = self.sampling_rate
-        last_level = signal[0]
-        for i in range(0, len(signal), samples_per_bit):
-            bit_signal = signal[i:i + samples_per_bit]
-            if len(bit_signal) < samples_per_bit // 2:
-                break
-            avg_level = np.mean(bit_signal)
-            bit = '1' if abs(avg_level - last_level) > 0.5 else '0'
-            bits.append(bit)
-            last_level = avg_level
-        return ''.join(bits)
-
-    def decode_manchester(self, signal: np.ndarray) -> str:
-
-        bits = []
+        return np.where(bits, np.int8(1), np.int8(-1))[..., None]
+
+    def _nrz_i_levels(self, bits: np.ndarray, level: int = -1) -> np.ndarray:
+
+        # the level flips on every '1': parity of the running count of ones
+        parity = np.logical_xor.accumulate(bits, axis=-1)
+        return np.where(parity, np.int8(-level), np.int8(level))[..., None]
+
+    def _manchester_levels(self, bits: np.ndarray) -> np.ndarray:
+
+        first = np.where(bits, np.int8(-1), np.int8(1))
+        return np.stack([first, -first], axis=-1)
+
+    def _differential_manchester_levels(self, bits: np.ndarray, level: int = 1) -> np.ndarray:
+
+        # each bit adds a mid-bit transition and each '0' one more at the bit start, so
+        # the transition count before the first half has the parity of (ones so far + 1)
+        parity = np.logical_xor.accumulate(bits, axis=-1)
+        first = np.where(parity, np.int8(level), np.int8(-level))
+        return np.stack([first, -first], axis=-1)
+
+    def _ami_levels(self, bits: np.ndarray, last_one: int = -1) -> np.ndarray:
+
+        parity = np.logical_xor.accumulate(bits, axis=-1)
+        marks = np.where(parity, np.int8(-last_one), np.int8(last_one))
+        return np.where(bits, marks, np.int8(0))[..., None]
+
+    def _encode_levels(self, scheme: str, bits: np.ndarray, state: dict, final: bool = True) -> np.ndarray:
+
+        # state carries the line state between calls: the NRZ-I / Differential Manchester
+        # level after the last bit, the polarity of the last AMI mark and, for B8ZS/HDB3,
+        # the HDB3 pulse parity and the zeros held back until their block is complete
+        if scheme in self.SCRAMBLING_BLOCKS:
+            block = self.SCRAMBLING_BLOCKS[scheme]
+            return self._scrambled_levels(self._hold_zeros(bits, block, state, final), block, state)
+        if scheme == "nrz_l":
+            return self._nrz_l_levels(bits)
+        if scheme == "manchester":
+            return self._manchester_levels(bits)
+        if scheme == "nrz_i":
+            levels = self._nrz_i_levels(bits, state.get("level", -1))
+        elif scheme == "diff_manchester":
+            levels = self._differential_manchester_levels(bits, state.get("level", 1))
+        elif scheme == "ami":
+            last_one = state.get("last_one", -1)
+            levels = self._ami_levels(bits, last_one)
+            state["last_one"] = -last_one if np.count_nonzero(bits) & 1 else last_one
+            return levels
+        else:
+            raise ValueError(f"Unknown encoding scheme: {scheme}")
+        if levels.ndim == 2 and levels.shape[0]:
+            state["level"] = int(levels[-1, -1])
+        return levels
+
+    def _hold_zeros(self, bits: np.ndarray, block: int, state: dict, final: bool) -> np.ndarray:
+
+        # trailing zeros that do not fill a whole block may still join a run in the next chunk
+        held = state.pop("held", 0)
+        if held:
+            bits = np.concatenate([np.zeros(held, dtype=bool), bits])
+        if not final and bits.size:
+            trailing = int(np.argmax(bits[::-1])) if bits.any() else bits.size
+            state["held"] = trailing % block
+            bits = bits[:bits.size - state["held"]]
+        return bits
+
+    def nrz_l(self, data, compact: bool = False, out: Optional[np.ndarray] = None):
+
+        return self.encode(data, "nrz_l", compact, out)
+
+    def nrz_i(self, data, compact: bool = False, out: Optional[np.ndarray] = None):
+
+        return self.encode(data, "nrz_i", compact, out)
+
+    def manchester(self, data, compact: bool = False, out: Optional[np.ndarray] = None):
+
+        return self.encode(data, "manchester", compact, out)
+
+    def differential_manchester(self, data, compact: bool = False, out: Optional[np.ndarray] = None):
+
+        return self.encode(data, "diff_manchester", compact, out)
+
+    def ami(self, data, compact: bool = False, out: Optional[np.ndarray] = None):
+
+        return self.encode(data, "ami", compact, out)
+
+    @instrumented("encode")
+    def encode(self, data, scheme: str, compact: bool = False, out: Optional[np.ndarray] = None):
+
+        # with out= (any writable array, e.g. an np.memmap) the samples are written there and
+        # out[:n_samples] is returned instead of a (time, signal) pair
+        bits = self._bit_array(data)
+        if out is not None:
+            if compact:
+                raise ValueError("out= receives dense samples and cannot be combined with compact=True")
+            return self._fill(self.encode(bits, scheme, compact=True), out)
+        return self._cached("encode", lambda: self._waveform(self._encode_levels(scheme, bits, {}), compact=compact),
+                            bits, scheme, compact)
+
+    def _fill(self, waveform: CompactWaveform, out: np.ndarray, block: int = 1 << 16) -> np.ndarray:
+
+        # expands a block of symbols at a time, so memory stays bounded however large out is
+        n_samples, samples_per_symbol = len(waveform), waveform.samples_per_symbol
+        if out.shape[-1] < n_samples:
+            raise ValueError(f"out holds {out.shape[-1]} samples but the waveform needs {n_samples}")
+        for start in range(0, waveform.levels.size, block):
+            levels = waveform.levels[start:start + block]
+            out[start * samples_per_symbol:(start + levels.size) * samples_per_symbol] = \
+                np.repeat(levels, samples_per_symbol)
+        return out[:n_samples]
+
+    def _samples_per_bit(self, scheme: str) -> int:
+
+        symbols_per_bit = self.SCHEMES[scheme][1]
+        return self.sampling_rate // symbols_per_bit * symbols_per_bit
+
+    @instrumented("encode_batch")
+    def encode_batch(self, sequences, schemes: List[str], max_workers: Optional[int] = None,
+                     parallel_threshold: int = 1 << 22) -> dict:
+
+        # Returns {scheme: (time, signals)} with int8 samples. Equal-length input (a 2-D array
+        # or a list of same-length sequences) is encoded as one stacked array and signals is
+        # 2-D; ragged input gives a list of 1-D signals and the time axis of the longest one.
+        # Ragged jobs of at least parallel_threshold bits are spread over a process pool.
+        if isinstance(sequences, np.ndarray) and sequences.ndim == 2:
+            rows = list(self._bit_array(sequences))
+        else:
+            rows = [self._bit_array(sequence) for sequence in sequences]
+        lengths = [row.size for row in rows]
+        results = {}
+        for scheme in schemes:
+            if scheme not in self.SCHEMES:
+                raise ValueError(f"Unknown encoding scheme: {scheme}")
+            symbols_per_bit = self.SCHEMES[scheme][1]
+            time = time_axis(max(lengths, default=0), symbols_per_bit, self.sampling_rate)
+            if len(set(lengths)) <= 1:
+                results[scheme] = time, self._encode_equal(rows, scheme)
+            else:
+                results[scheme] = time, self._encode_ragged(rows, scheme, max_workers, parallel_threshold)
+        return results
+
+    def _encode_equal(self, rows: List[np.ndarray], scheme: str) -> np.ndarray:
+
+        samples_per_symbol = self.sampling_rate // self.SCHEMES[scheme][1]
+        if not rows:
+            return np.empty((0, 0), dtype=np.int8)
+        if scheme in self.SCRAMBLING_BLOCKS:
+            # substitution blocks follow zero runs, which must not run across rows
+            levels = np.stack([self._encode_levels(scheme, row, {}) for row in rows])
+        else:
+            levels = self._encode_levels(scheme, np.stack(rows), {})
+        return np.repeat(levels.reshape(len(rows), -1), samples_per_symbol, axis=-1)
+
+    def _encode_ragged(self, rows: List[np.ndarray], scheme: str, max_workers: Optional[int],
+                       parallel_threshold: int) -> List[np.ndarray]:
+
+        samples_per_bit = self._samples_per_bit(scheme)
+        bounds = np.concatenate([[0], np.cumsum([row.size * samples_per_bit for row in rows])])
+        jobs = [(int(bounds[i]), row) for i, row in enumerate(rows)]
+        total_bits = sum(row.size for row in rows)
+        if max_workers == 1 or total_bits < parallel_threshold:
+            flat = np.empty(int(bounds[-1]), dtype=np.int8)
+            _encode_rows_into(flat, scheme, self.sampling_rate, jobs)
+        else:
+            flat = self._encode_in_pool(scheme, jobs, int(bounds[-1]), max_workers)
+        return [flat[bounds[i]:bounds[i + 1]] for i in range(len(rows))]
+
+    def _encode_in_pool(self, scheme: str, jobs: list, n_samples: int, max_workers: Optional[int]) -> np.ndarray:
+
+        # workers receive packed bits and write their samples straight into one shared memory
+        # block, so no waveform is pickled back; it is copied out once and unlinked
+        from concurrent.futures import ProcessPoolExecutor
+        from multiprocessing import shared_memory
+
+        workers = max_workers or os.cpu_count() or 1
+        batches = [[] for _ in range(workers * 4)]
+        for i, (offset, row) in enumerate(sorted(jobs, key=lambda job: -job[1].size)):
+            batches[i % len(batches)].append((offset, np.packbits(row), row.size))
+        block = shared_memory.SharedMemory(create=True, size=max(n_samples, 1))
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(_encode_packed_into_shared, block.name, n_samples, scheme,
+                                       self.sampling_rate, batch) for batch in batches if batch]
+                for future in futures:
+                    future.result()
+            shared = np.ndarray((n_samples,), dtype=np.int8, buffer=block.buf)
+            flat = shared.copy()
+            del shared
+        finally:
+            block.close()
+            block.unlink()
+        return flat
+
+    def _iter_chunks(self, source, chunk_size: int) -> Iterator:
+
+        if isinstance(source, np.memmap):
+            # file-backed arrays are read one chunk at a time
+            for start in range(0, source.shape[-1], chunk_size):
+                yield source[..., start:start + chunk_size]
+        elif isinstance(source, (str, np.ndarray, BitBuffer) + BYTES_LIKE):
+            yield source
+        elif hasattr(source, "read"):
+            for chunk in iter(lambda: source.read(chunk_size), source.read(0)):
+                yield chunk
+        else:
+            yield from source
+
+    def _iter_samples(self, source, chunk_size: int) -> Iterator[np.ndarray]:
+
+        # analog samples in chunks of chunk_size: arrays are sliced and analog sources read by
+        # sample range; any other iterable is taken chunk by chunk as it comes
+        if isinstance(source, AnalogSource):
+            for start in range(0, source.n_samples, chunk_size):
+                yield source.samples(start, min(start + chunk_size, source.n_samples))
+        elif isinstance(source, np.ndarray):
+            for start in range(0, source.shape[-1], chunk_size):
+                yield source[..., start:start + chunk_size]
+        else:
+            yield from source
+
+    def encode_stream(self, source, scheme: str, chunk_size: int = 1 << 16, compact: bool = False) -> Iterator:
+
+        # source is an iterable of bit chunks (anything as_bits accepts), a text file of '0'/'1'
+        # or a binary file of packed bits; the concatenated output is identical to one call
+        state, bit_offset = {}, 0
+        for chunk in self._iter_chunks(source, chunk_size):
+            if isinstance(chunk, str) and hasattr(source, "read"):
+                chunk = ''.join(chunk.split())
+            bits = self._bit_array(chunk)
+            if not bits.size:
+                continue
+            levels = self._encode_levels(scheme, bits, state, final=False)
+            yield self._waveform(levels, bit_offset, compact)
+            bit_offset += levels.shape[0]
+        if state.get("held"):
+            yield self._waveform(self._encode_levels(scheme, np.empty(0, dtype=bool), state), bit_offset, compact)
+
+    def scramble_stream(self, source, scheme: str, chunk_size: int = 1 << 16) -> Iterator[str]:
+
+        # chunked b8zs_scramble/hdb3_scramble: the joined strings equal one call on all bits
+        block, state = self.SCRAMBLING_BLOCKS[scheme], {}
+        for final, chunk in itertools.chain(((False, chunk) for chunk in self._iter_chunks(source, chunk_size)),
+                                            [(True, np.empty(0, dtype=bool))]):
+            if isinstance(chunk, str) and hasattr(source, "read"):
+                chunk = ''.join(chunk.split())
+            bits = self._hold_zeros(self._bit_array(chunk), block, state, final)
+            if bits.size:
+                violations, bipolar, state["pulses"] = self._substitutions(bits, block, state.get("pulses", 0))
+                yield self._symbol_string(bits, violations, bipolar)
+
+    def decode_stream(self, source, scheme: str, sampling: str = "mean") -> Iterator[BitBuffer]:
+
+        # partial bit periods are held back until the next chunk; NRZ-I and Differential
+        # Manchester also keep the last complete bit so the first new bit is compared against
+        # the level before it
+        if scheme in self.SCRAMBLING_BLOCKS:
+            yield from self._descramble_stream(source, scheme, sampling)
+            return
         samples_per_bit = self.sampling_rate
-        for i in range(0, len(signal), samples_per_bit):
-            bit_signal = signal[i:i + samples_per_bit]
-            if len(bit_signal) < samples_per_bit // 2:
-                break
-            first_half = np.mean(bit_signal[:len(bit_signal) // 2])
-            second_half = np.mean(bit_signal[len(bit_signal) // 2:])
-            bits.append('1' if first_half < second_half else '0')
-        return ''.join(bits)
-
-    def decode_differential_manchester(self, signal: np.ndarray) -> str:
-
-        bits = []
+        pending = np.empty(0)
+        carried_bit = False
+        for chunk in self._iter_chunks(source, samples_per_bit << 12):
+            pending = np.concatenate([pending, np.asarray(chunk)]) if pending.size else np.asarray(chunk)
+            usable = pending.shape[-1] // samples_per_bit * samples_per_bit
+            if usable <= samples_per_bit * carried_bit:
+                continue
+            bits = self._decode_levels(pending[:usable], scheme, sampling)
+            yield BitBuffer.from_bits(bits[1:] if carried_bit else bits)
+            carried_bit = scheme in ("nrz_i", "diff_manchester")
+            keep = usable - samples_per_bit if carried_bit else usable
+            pending = pending[keep:]
+        if pending.shape[-1] > samples_per_bit * carried_bit:
+            bits = self._decode_levels(pending, scheme, sampling)
+            bits = bits[1:] if carried_bit else bits
+            if bits.size:
+                yield BitBuffer.from_bits(bits)
+
+    def _descramble_stream(self, source, scheme: str, sampling: str) -> Iterator[BitBuffer]:
+
+        # the last block - 1 bit levels are held back, moved earlier if a substitution block
+        # straddles the cut, so every B8ZS/HDB3 block is descrambled in one piece
+        block = self.SCRAMBLING_BLOCKS[scheme]
         samples_per_bit = self.sampling_rate
-        for i in range(0, len(signal), samples_per_bit):
-            bit_signal = signal[i:i + samples_per_bit]
-            if len(bit_signal) < samples_per_bit // 2:
-                break
-            first_half = np.mean(bit_signal[:len(bit_signal) // 2])
-            second_half = np.mean(bit_signal[len(bit_signal) // 2:])
-            bits.append('1' if abs(first_half - second_half) > 0.5 else '0')
-        return ''.join(bits)
-
-    def decode_ami(self, signal: np.ndarray) -> str:
-
-        bits = []
+        pending, held, last_one = np.empty(0), np.empty(0, dtype=np.int8), -1
+        for chunk in self._iter_chunks(source, samples_per_bit << 12):
+            pending = np.concatenate([pending, np.asarray(chunk)]) if pending.size else np.asarray(chunk)
+            usable = pending.shape[-1] // samples_per_bit * samples_per_bit
+            ternary = np.concatenate([held, self._ternary_levels(pending[:usable], sampling)])
+            pending = pending[usable:]
+            bits, starts = self._descramble(ternary, block, last_one)
+            cut = max(ternary.size - (block - 1), 0)
+            straddling = starts[(starts < cut) & (starts + block > cut)]
+            if straddling.size:
+                cut = int(straddling[0])
+            if cut:
+                marks = np.flatnonzero(ternary[:cut])
+                if marks.size:
+                    last_one = int(ternary[marks[-1]])
+                yield BitBuffer.from_bits(bits[:cut])
+            held = ternary[cut:]
+        ternary = np.concatenate([held, self._ternary_levels(pending, sampling)]) if pending.size else held
+        if ternary.size:
+            yield BitBuffer.from_bits(self._descramble(ternary, block, last_one)[0])
+
+
+    def _reduce_blocks(self, blocks: np.ndarray, sampling: str) -> np.ndarray:
+
+        if sampling == "mean":
+            return np.mean(blocks, axis=-1)
+        if sampling == "mid":
+            if blocks.shape[-1] == 0:
+                return np.full(blocks.shape[:-1], np.nan)
+            return blocks[..., blocks.shape[-1] // 2].astype(float)
+        raise ValueError(f"Unknown sampling mode: {sampling}")
+
+    def _split_symbols(self, blocks: np.ndarray, symbols_per_bit: int, sampling: str) -> np.ndarray:
+
+        if symbols_per_bit == 1:
+            return self._reduce_blocks(blocks, sampling)[..., None]
+        half = blocks.shape[-1] // 2
+        return np.stack([self._reduce_blocks(blocks[..., :half], sampling),
+                         self._reduce_blocks(blocks[..., half:], sampling)], axis=-1)
+
+    def _block_values(self, signal: np.ndarray, symbols_per_bit: int, sampling: str = "mean") -> np.ndarray:
+
+        # one value per bit (or half bit) with shape (..., n_bits, symbols_per_bit); a trailing
+        # partial block counts as a bit when it holds at least samples_per_bit // 2 samples
         samples_per_bit = self.sampling_rate
-        for i in range(0, len(signal), samples_per_bit):
-            bit_signal = signal[i:i + samples_per_bit]
-            if len(bit_signal) < samples_per_bit // 2:
-                break
-            avg_voltage = np.mean(bit_signal)
-            bits.append('1' if abs(avg_voltage) > 0.1 else '0')
-        return ''.join(bits)
-
-
-    def find_zero_sequences(self, data: str) -> List[Tuple[int, int]]:
-
-        sequences, i = [], 0
-        while i < len(data):
-            if data[i] == '0':
-                start, count = i, 0
-                while i < len(data) and data[i] == '0':
-                    count += 1;
-                    i += 1
-                sequences.append((start, count))
-            else:
-                i += 1
-        return sequences
-
-    def b8zs_scramble(self, data: str) -> str:
-
-        result = list(data)
-        sequences = self.find_zero_sequences(data)
-        for start, length in sequences:
-            if length >= 8:
-                for j in range(start, start + length - 7, 8):
-                    result[j:j + 8] = ['0', '0', '0', 'V', 'B', '0', 'V', 'B']
-        return ''.join(result)
-
-    def hdb3_scramble(self, data: str) -> str:
-
-        result = list(data)
-        sequences = self.find_zero_sequences(data)
-        ones_count = 0
-        for start, length in sequences:
-            if length >= 4:
-                for j in range(start, start + length - 3, 4):
-                    if ones_count % 2 == 0:
-                        result[j:j + 4] = ['0', '0', '0', 'V']
-                    else:
-                        result[j:j + 4] = ['B', '0', '0', 'V']
-                    ones_count += 1
-        return ''.join(result)
+        n_full = signal.shape[-1] // samples_per_bit
+        full = signal[..., :n_full * samples_per_bit].reshape(signal.shape[:-1] + (n_full, samples_per_bit))
+        values = self._split_symbols(full, symbols_per_bit, sampling)
+        tail = signal[..., n_full * samples_per_bit:]
+        if tail.shape[-1] and tail.shape[-1] >= samples_per_bit // 2:
+            tail_values = self._split_symbols(tail[..., None, :], symbols_per_bit, sampling)
+            values = np.concatenate([values, tail_values], axis=-2)
+        return values
+
+    def _symbol_values(self, signal, symbols_per_bit: int, sampling: str) -> np.ndarray:
+
+        if not isinstance(signal, CompactWaveform):
+            return self._block_values(signal, symbols_per_bit, sampling)
+        # the symbol levels already are the block values; only the symbol granularity may differ
+        levels = signal.bit_levels().astype(float)
+        if symbols_per_bit == levels.shape[-1]:
+            return levels
+        if symbols_per_bit == 2:
+            return np.repeat(levels, 2, axis=-1)
+        if sampling == "mid":
+            return levels[:, 1:]
+        return levels.mean(axis=-1, keepdims=True)
+
+    def _decode_levels(self, signal, scheme: str, sampling: str = "mean") -> np.ndarray:
+
+        # the differential codes compare each bit with the level before it, seeded with the
+        # encoder's idle level: -1 for NRZ-I, +1 for Differential Manchester
+        if not isinstance(signal, CompactWaveform):
+            signal = np.asarray(signal)
+        if scheme == "nrz_l":
+            return self._symbol_values(signal, 1, sampling)[..., 0] > 0
+        if scheme == "nrz_i":
+            levels = self._symbol_values(signal, 1, sampling)[..., 0]
+            previous = np.concatenate([np.full(levels.shape[:-1] + (1,), -1.0), levels[..., :-1]], axis=-1)
+            return levels * previous < 0
+        if scheme == "manchester":
+            values = self._symbol_values(signal, 2, sampling)
+            return values[..., 0] < values[..., 1]
+        if scheme == "diff_manchester":
+            # a '0' has a transition at the bit start, a '1' only the mid-bit one
+            values = self._symbol_values(signal, 2, sampling)
+            previous = np.concatenate([np.ones(values.shape[:-2] + (1,)), values[..., :-1, 1]], axis=-1)
+            return values[..., 0] * previous > 0
+        if scheme == "ami":
+            return np.abs(self._symbol_values(signal, 1, sampling)[..., 0]) > 0.1
+        if scheme in ("b8zs", "hdb3"):
+            return self._descramble(self._ternary_levels(signal, sampling), self.SCRAMBLING_BLOCKS[scheme])[0]
+        raise ValueError(f"Unknown encoding scheme: {scheme}")
+
+    @instrumented("decode")
+    def decode_bits(self, signal, scheme: str, sampling: str = "mean") -> BitBuffer:
+
+        if isinstance(signal, np.memmap) and signal.ndim == 1:
+            # file-backed captures are decoded block by block through decode_stream
+            chunks = [chunk.unpack() for chunk in self.decode_stream(signal, scheme, sampling)]
+            return BitBuffer.from_bits(np.concatenate(chunks) if chunks else np.empty(0, dtype=bool))
+        if not isinstance(signal, CompactWaveform):
+            signal = np.asarray(signal)
+        return self._cached("decode", lambda: BitBuffer.from_bits(self._decode_levels(signal, scheme, sampling)),
+                            signal, scheme, sampling)
+
+    @instrumented("decode_batch")
+    def decode_batch(self, signals, scheme: str, sampling: str = "mean") -> np.ndarray:
+
+        # rows of equal-length captures (2-D) -> bool array of shape (rows, n_bits); the level
+        # decoders work on the whole stack, B8ZS/HDB3 descramble row by row
+        signals = np.asarray(signals)
+        if scheme in self.SCRAMBLING_BLOCKS:
+            return np.stack([self._decode_levels(row, scheme, sampling) for row in signals]) \
+                if len(signals) else np.empty((0, 0), dtype=bool)
+        return self._decode_levels(signals, scheme, sampling)
+
+    def decode_nrz_l(self, signal, sampling: str = "mean", packed: bool = False):
+
+        bits = self.decode_bits(signal, "nrz_l", sampling)
+        return bits if packed else bits.to_str()
+
+    def decode_nrz_i(self, signal, sampling: str = "mean", packed: bool = False):
+
+        bits = self.decode_bits(signal, "nrz_i", sampling)
+        return bits if packed else bits.to_str()
+
+    def decode_manchester(self, signal, sampling: str = "mean", packed: bool = False):
+
+        bits = self.decode_bits(signal, "manchester", sampling)
+        return bits if packed else bits.to_str()
+
+    def decode_differential_manchester(self, signal, sampling: str = "mean", packed: bool = False):
+
+        bits = self.decode_bits(signal, "diff_manchester", sampling)
+        return bits if packed else bits.to_str()
+
+    def decode_ami(self, signal, sampling: str = "mean", packed: bool = False):
+
+        bits = self.decode_bits(signal, "ami", sampling)
+        return bits if packed else bits.to_str()
+
+
+    def _zero_runs(self, bits: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+
+        # run boundaries are where the zero mask changes; starts and ends alternate
+        zeros = np.concatenate([[False], ~bits, [False]])
+        bounds = np.flatnonzero(zeros[1:] != zeros[:-1])
+        return bounds[0::2], bounds[1::2] - bounds[0::2]
+
+    def find_zero_sequences(self, data) -> List[Tuple[int, int]]:
+
+        starts, lengths = self._zero_runs(self._bit_array(data))
+        return list(zip(starts.tolist(), lengths.tolist()))
+
+    def _substitutions(self, bits: np.ndarray, block: int, pulses: int = 0) -> Tuple[np.ndarray, np.ndarray, int]:
+
+        # every run of zeros is cut into whole blocks of 8 (B8ZS) or 4 (HDB3) from its start;
+        # returns the V and B positions and the parity of HDB3 pulses after the last V
+        starts, lengths = self._zero_runs(bits)
+        counts = lengths // block
+        first = np.cumsum(counts) - counts
+        groups = np.repeat(starts, counts) + block * (np.arange(counts.sum()) - np.repeat(first, counts))
+        if block == 8:
+            return np.concatenate([groups + 3, groups + 6]), np.concatenate([groups + 4, groups + 7]), 0
+        ones = np.cumsum(bits)
+        if not groups.size:
+            return groups, groups, (pulses + int(ones[-1] if ones.size else 0)) & 1
+        # the pulse count since the last V is the number of marks since the previous block,
+        # because each block ends with its V: odd -> 000V, even -> B00V
+        since_violation = np.diff(ones[groups], prepend=0)
+        since_violation[0] += pulses
+        return groups + 3, groups[since_violation % 2 == 0], int(ones[-1] - ones[groups[-1]]) & 1
+
+    def _pulse_levels(self, bits: np.ndarray, violations: np.ndarray, bipolar: np.ndarray,
+                      last_one: int = -1) -> Tuple[np.ndarray, int]:
+
+        # marks and B pulses alternate polarity, a V repeats the polarity of the pulse before it
+        flips = bits.copy()
+        flips[bipolar] = True
+        pulses = flips.copy()
+        pulses[violations] = True
+        parity = np.logical_xor.accumulate(flips)
+        levels = np.where(pulses, np.where(parity, np.int8(-last_one), np.int8(last_one)), np.int8(0))
+        if parity.size and parity[-1]:
+            last_one = -last_one
+        return levels[:, None], last_one
+
+    def _scrambled_levels(self, bits: np.ndarray, block: int, state: dict) -> np.ndarray:
+
+        violations, bipolar, state["pulses"] = self._substitutions(bits, block, state.get("pulses", 0))
+        levels, state["last_one"] = self._pulse_levels(bits, violations, bipolar, state.get("last_one", -1))
+        return levels
+
+    def _symbol_string(self, bits: np.ndarray, violations: np.ndarray, bipolar: np.ndarray) -> str:
+
+        symbols = bits.astype(np.uint8) + ord('0')
+        symbols[violations] = ord('V')
+        symbols[bipolar] = ord('B')
+        return symbols.tobytes().decode('ascii')
+
+    def b8zs(self, data, compact: bool = False, out: Optional[np.ndarray] = None):
+
+        return self.encode(data, "b8zs", compact, out)
+
+    def hdb3(self, data, compact: bool = False, out: Optional[np.ndarray] = None):
+
+        return self.encode(data, "hdb3", compact, out)
+
+    @instrumented("scramble")
+    def _scramble(self, data, block: int) -> str:
+
+        bits = self._bit_array(data)
+
+        def compute():
+
+            violations, bipolar, _ = self._substitutions(bits, block)
+            return self._symbol_string(bits, violations, bipolar)
+
+        return self._cached("scramble", compute, bits, block)
+
+    def b8zs_scramble(self, data) -> str:
+
+        return self._scramble(data, 8)
+
+    def hdb3_scramble(self, data) -> str:
+
+        return self._scramble(data, 4)
+
+    def _descramble(self, ternary: np.ndarray, block: int, last_one: int = -1) -> Tuple[np.ndarray, np.ndarray]:
+
+        # a V is a pulse with the same polarity as the pulse before it; B8ZS blocks carry two
+        # (000VB0VB), so only a V followed by another V three bits later starts a block
+        marks = np.flatnonzero(ternary)
+        polarity = ternary[marks]
+        violations = marks[polarity == np.concatenate([[last_one], polarity[:-1]])]
+        if block == 8:
+            violations = violations[np.isin(violations + 3, violations)]
+        starts = violations - 3
+        starts = starts[starts >= 0]
+        cleared = (starts[:, None] + np.arange(block)).ravel()
+        bits = ternary != 0
+        bits[cleared[cleared < bits.size]] = False
+        return bits, starts
+
+    def _ternary_levels(self, signal, sampling: str = "mean") -> np.ndarray:
+
+        values = self._symbol_values(signal, 1, sampling)[..., 0]
+        return np.where(np.abs(values) > 0.1, np.sign(values), 0).astype(np.int8)
+
+    def b8zs_descramble(self, signal, sampling: str = "mean", packed: bool = False):
+
+        bits = self.decode_bits(signal, "b8zs", sampling)
+        return bits if packed else bits.to_str()
 
+    def hdb3_descramble(self, signal, sampling: str = "mean", packed: bool = False):
 
+        bits = self.decode_bits(signal, "hdb3", sampling)
+        return bits if packed else bits.to_str()
@@ -0,0 +1,244 @@
+import functools
+import json
+import logging
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+
+from typing import Dict, List, Optional
+
+from bitbuffer import BitBuffer
+from compactwaveform import CompactWaveform
+
+
+class StageRecord:
+
+    __slots__ = ("name", "parent", "seconds", "samples", "allocated_bytes", "timestamp")
+
+    def __init__(self, name: str, parent: Optional[str] = None):
+        self.name = name
+        self.parent = parent
+        self.seconds = 0.0
+        self.samples = 0
+        # net traced allocation over the stage; None unless memory tracking is on
+        self.allocated_bytes = None
+        self.timestamp = time.time()
+
+    def as_dict(self) -> dict:
+
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+
+class _Stage:
+
+    def __init__(self, probe: "Instrumentation", name: str, samples: int):
+        self.probe = probe
+        self.record = StageRecord(name)
+        self.record.samples = samples
+
+    def __enter__(self) -> StageRecord:
+
+        stack = self.probe._stack()
+        self.record.parent = stack[-1].name if stack else None
+        stack.append(self.record)
+        self.memory = tracemalloc.get_traced_memory()[0] if self.probe.track_memory else None
+        self.start = time.perf_counter()
+        return self.record
+
+    def __exit__(self, *exc_info) -> None:
+
+        self.record.seconds = time.perf_counter() - self.start
+        if self.memory is not None:
+            self.record.allocated_bytes = tracemalloc.get_traced_memory()[0] - self.memory
+        self.probe._stack().pop()
+        self.probe.emit(self.record)
+
+
+class _NullStage:
+
+    # shared by every stage() call while no sink is attached
+    def __enter__(self) -> StageRecord:
+
+        return _NULL_RECORD
+
+    def __exit__(self, *exc_info) -> None:
+
+        pass
+
+
+_NULL_RECORD = StageRecord("disabled")
+_NULL_STAGE = _NullStage()
+
+
+class Instrumentation:
+
+    # Per-stage timing. Stages nest (records name their parent) and are tracked per thread,
+    # so the GUI worker and the Tk thread can both report. With no sinks, stage() returns a
+    # shared no-op context and instrumented methods call straight through.
+
+    def __init__(self, sinks=(), track_memory: bool = False):
+        self.sinks = list(sinks)
+        self.track_memory = track_memory
+        self._local = threading.local()
+        self._started_tracing = track_memory and not tracemalloc.is_tracing()
+        if self._started_tracing:
+            tracemalloc.start()
+
+    def close(self) -> None:
+
+        # tracemalloc slows every allocation, so stop it if this object started it
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+        self.track_memory = False
+
+    @property
+    def enabled(self) -> bool:
+
+        return bool(self.sinks)
+
+    def _stack(self) -> List[StageRecord]:
+
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def stage(self, name: str, samples: int = 0):
+
+        # with probe.stage("encode") as record: ...; set record.samples inside if not known up front
+        if not self.sinks:
+            return _NULL_STAGE
+        return _Stage(self, name, samples)
+
+    def emit(self, record: StageRecord) -> None:
+
+        for sink in self.sinks:
+            sink.emit(record)
+
+    def timed(self, name: str):
+
+        # decorator for plain functions; methods of objects with an instrumentation attribute
+        # use instrumented() instead
+        def decorate(func):
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+
+                if not self.sinks:
+                    return func(*args, **kwargs)
+                with self.stage(name) as record:
+                    result = func(*args, **kwargs)
+                    record.samples = sample_count(result)
+                return result
+
+            return wrapper
+
+        return decorate
+
+
+def instrumented(name: str):
+
+    # method decorator that reports to self.instrumentation when it has sinks
+    def decorate(method):
+
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+
+            probe = self.instrumentation
+            if not probe.sinks:
+                return method(self, *args, **kwargs)
+            with probe.stage(name) as record:
+                result = method(self, *args, **kwargs)
+                record.samples = sample_count(result)
+            return result
+
+        return wrapper
+
+    return decorate
+
+
+def sample_count(result) -> int:
+
+    # samples (or bits, or symbols) in a stage result; 0 when there is no obvious count
+    if isinstance(result, (CompactWaveform, BitBuffer, str)):
+        return len(result)
+    if isinstance(result, np.ndarray):
+        return result.size
+    if isinstance(result, tuple) and result and isinstance(result[-1], np.ndarray):
+        return result[-1].size
+    if isinstance(result, tuple) and result and isinstance(result[0], (BitBuffer, str)):
+        return len(result[0])
+    return 0
+
+
+class LoggingSink:
+
+    def __init__(self, logger: Optional[logging.Logger] = None, level: int = logging.INFO):
+        self.logger = logger or logging.getLogger("signalgenerator.stages")
+        self.level = level
+
+    def emit(self, record: StageRecord) -> None:
+
+        memory = "" if record.allocated_bytes is None else f", {record.allocated_bytes} bytes"
+        self.logger.log(self.level, "stage %s: %.3f ms, %d samples%s", record.name, record.seconds * 1e3,
+                        record.samples, memory)
+
+
+class JsonLinesSink:
+
+    # one JSON object per stage; pass a path (appended to) or an open text stream
+    def __init__(self, target):
+        self.owns_stream = isinstance(target, str)
+        self.stream = open(target, "a") if self.owns_stream else target
+        self._lock = threading.Lock()
+
+    def emit(self, record: StageRecord) -> None:
+
+        line = json.dumps(record.as_dict())
+        with self._lock:
+            self.stream.write(line + "\n")
+            self.stream.flush()
+
+    def close(self) -> None:
+
+        if self.owns_stream:
+            self.stream.close()
+
+
+class AggregatingSink:
+
+    # per-stage call count, total/max time, samples and bytes, kept in memory
+    def __init__(self):
+        self.stages: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def emit(self, record: StageRecord) -> None:
+
+        with self._lock:
+            stage = self.stages.setdefault(record.name, {"calls": 0, "seconds": 0.0, "max_seconds": 0.0,
+                                                         "samples": 0, "allocated_bytes": None})
+            stage["calls"] += 1
+            stage["seconds"] += record.seconds
+            stage["max_seconds"] = max(stage["max_seconds"], record.seconds)
+            stage["samples"] += record.samples
+            if record.allocated_bytes is not None:
+                stage["allocated_bytes"] = (stage["allocated_bytes"] or 0) + record.allocated_bytes
+
+    def reset(self) -> None:
+
+        with self._lock:
+            self.stages.clear()
+
+    def summary(self) -> str:
+
+        with self._lock:
+            stages = sorted(self.stages.items(), key=lambda item: -item[1]["seconds"])
+        lines = [f"{'stage':<22}{'calls':>6}{'total ms':>11}{'max ms':>10}{'samples':>12}{'KiB':>10}"]
+        for name, stage in stages:
+            memory = "-" if stage["allocated_bytes"] is None else f"{stage['allocated_bytes'] / 1024:.1f}"
+            lines.append(f"{name:<22}{stage['calls']:>6}{stage['seconds'] * 1e3:>11.2f}"
+                         f"{stage['max_seconds'] * 1e3:>10.2f}{stage['samples']:>12}{memory:>10}")
+        return "\n".join(lines)
@@ -1,11 +1,58 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
+from analogsource import tone_wave
+from bitbuffer import BitBuffer
 from digitalsignalgenerator import DigitalSignalGenerator
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from instrumentation import AggregatingSink, Instrumentation
+from signalplot import SignalPlot
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
 from matplotlib.figure import Figure
 import tkinter as tk
 from tkinter import ttk, messagebox, scrolledtext
 
 
+POLL_MS = 50
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class BackgroundJob:
+
+    # One generate/decode run on the worker thread. The worker announces stages through
+    # step(), which is also where a cancel request takes effect and where the previous
+    # stage's timing ends; the Tk side only reads stage/completed while polling.
+
+    def __init__(self, title: str, total_stages: int, probe: Instrumentation):
+        self.title = title
+        self.total_stages = total_stages
+        self.completed = 0
+        self.stage = "Queued"
+        self.cancel = threading.Event()
+        self.future = None
+        self.probe = probe
+        self.timing = None
+
+    def step(self, stage: str):
+
+        if self.cancel.is_set():
+            raise JobCancelled()
+        self.finish()
+        if self.stage != "Queued":
+            self.completed += 1
+        self.stage = stage
+        self.timing = self.probe.stage(stage)
+        self.timing.__enter__()
+
+    def finish(self):
+
+        if self.timing is not None:
+            self.timing.__exit__(None, None, None)
+            self.timing = None
+
 
 class DigitalSignalGeneratorGUI:
 
@@ -17,12 +64,20 @@ class DigitalSignalGeneratorGUI:
         self.root.configure(bg="#f0f0f0")
 
         self.generator = DigitalSignalGenerator()
-        self.current_data = ""
+        self.current_data = BitBuffer.coerce("")
         self.current_signal = None
-        self.current_time = None
         self.current_scheme = None
+        self.current_palindrome = None
+
+        # a single worker runs jobs in order; a newer job cancels the one before it
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.job = None
+        # stage timing is opt-in: the generator reports to stage_totals only while profiling
+        self.stage_totals = AggregatingSink()
+        self.profiler = None
 
         self.setup_ui()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
 
     def setup_ui(self):
 
@@ -72,9 +127,9 @@ class DigitalSignalGeneratorGUI:
 
         ttk.Label(left_panel, text="Line Encoding:", font=("Arial", 10, "bold")).pack(anchor=tk.W, pady=(10, 5))
         self.encoding_scheme = tk.StringVar(value="nrz_l")
-        for text, value in [("NRZ-L", "nrz_l"), ("NRZ-I", "nrz_i"), ("Manchester", "manchester"),
-                            ("Diff Manchester", "diff_manchester"), ("AMI", "ami")]:
-            ttk.Radiobutton(left_panel, text=text, variable=self.encoding_scheme, value=value).pack(anchor=tk.W)
+        for value, (text, _) in self.generator.SCHEMES.items():
+            if value not in self.generator.SCRAMBLING_BLOCKS:
+                ttk.Radiobutton(left_panel, text=text, variable=self.encoding_scheme, value=value).pack(anchor=tk.W)
 
         self.scrambling_frame = ttk.LabelFrame(left_panel, text="Scrambling (AMI only)", padding=5)
         self.scrambling_frame.pack(fill=tk.X, pady=10)
@@ -92,6 +147,18 @@ class DigitalSignalGeneratorGUI:
         ttk.Button(button_frame, text="Generate Signal", command=self.generate_signal).pack(side=tk.LEFT, padx=5)
         ttk.Button(button_frame, text="Clear", command=self.clear_all).pack(side=tk.LEFT, padx=5)
 
+        progress_frame = ttk.Frame(left_panel)
+        progress_frame.pack(fill=tk.X, pady=5)
+        self.status_text = tk.StringVar(value="Ready")
+        ttk.Label(progress_frame, textvariable=self.status_text, font=("Arial", 9)).pack(anchor=tk.W)
+        self.progress = ttk.Progressbar(progress_frame, mode="determinate", maximum=1)
+        self.progress.pack(fill=tk.X, pady=2)
+        self.cancel_button = ttk.Button(progress_frame, text="Cancel", command=self.cancel_job, state=tk.DISABLED)
+        self.cancel_button.pack(anchor=tk.W)
+        self.profile_stages = tk.BooleanVar(value=False)
+        ttk.Checkbutton(progress_frame, text="Profile stages", variable=self.profile_stages,
+                        command=self.on_profile_toggle).pack(anchor=tk.W)
+
 
         right_panel = ttk.Frame(main_container)
         right_panel.grid(row=0, column=1, sticky="nsew", padx=5, pady=5)
@@ -99,7 +166,9 @@ class DigitalSignalGeneratorGUI:
         self.fig = Figure(figsize=(8, 5), dpi=100)
         self.ax = self.fig.add_subplot(111)
         self.canvas = FigureCanvasTkAgg(self.fig, master=right_panel)
+        toolbar = NavigationToolbar2Tk(self.canvas, right_panel)
         self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        self.plot = SignalPlot(self.ax, self.canvas, toolbar)
 
 
         bottom_panel = ttk.LabelFrame(self.root, text="Output & Analysis", padding=10)
@@ -125,96 +194,170 @@ class DigitalSignalGeneratorGUI:
             self.binary_frame.pack_forget()
             self.analog_frame.pack(fill=tk.X, pady=10)
 
-    def generate_analog_signal(self):
+    def generate_analog_signal(self, signal_type: str):
 
-        t = np.linspace(0, 2 * np.pi, 50)
-        signal_type = self.signal_type.get()
-        if signal_type == "sine":
-            return np.sin(t)
-        elif signal_type == "cosine":
-            return np.cos(t)
-        else:
-            return np.sign(np.sin(t))
+        # one period over 50 samples, endpoints included
+        return tone_wave(signal_type, np.linspace(0, 2 * np.pi, 50))
 
-    def generate_signal(self):
+    def on_profile_toggle(self):
 
-        try:
-            self.output_text.delete(1.0, tk.END)
-
-            if self.input_type.get() == "digital":
-                data = self.binary_input.get().strip()
-                if not data or not all(c in '01' for c in data):
-                    messagebox.showerror("Error", "Enter valid binary string!")
-                    return
-                self.current_data = data
-            else:
-                analog_signal = self.generate_analog_signal()
-                self.current_data = self.generator.pcm_encode(analog_signal,
-                                                              8) if self.modulation.get() == "pcm" else self.generator.delta_modulation(
-                    analog_signal, 0.15)
-
-            palindrome, start, length = self.generator.longest_palindrome_manacher(self.current_data)
-            scheme = self.encoding_scheme.get()
-            self.current_scheme = scheme
-
-            scheme_map = {
-                "nrz_l": ("NRZ-L", self.generator.nrz_l),
-                "nrz_i": ("NRZ-I", self.generator.nrz_i),
-                "manchester": ("Manchester", self.generator.manchester),
-                "diff_manchester": ("Differential Manchester", self.generator.differential_manchester),
-                "ami": ("AMI", self.generator.ami)
-            }
-
-            scheme_name, encoder = scheme_map[scheme]
-            self.current_time, self.current_signal = encoder(self.current_data)
-
-            scrambled_data = None
-            if scheme == "ami" and self.use_scrambling.get():
-                scrambled_data = self.generator.b8zs_scramble(
-                    self.current_data) if self.scrambling_type.get() == "b8zs" else self.generator.hdb3_scramble(
-                    self.current_data)
-
-            output = f"{'=' * 60}\nSIGNAL GENERATION REPORT\n{'=' * 60}\n\n"
-            output += f"Input Data: {self.current_data[:50]}{'...' if len(self.current_data) > 50 else ''}\n"
-            output += f"Data Length: {len(self.current_data)} bits\n"
-            output += f"Encoding: {scheme_name}\n\n"
-            output += f"{'=' * 60}\nPALINDROME \n{'=' * 60}\n"
-
-
-            if scrambled_data:
-                output += f"{'=' * 60}\nSCRAMBLING\n{'=' * 60}\n"
-                output += f"Type: {self.scrambling_type.get().upper()}\n"
-                output += f"Data: {scrambled_data[:50]}{'...' if len(scrambled_data) > 50 else ''}\n\n"
-
-
-            output += f"Mean: {np.mean(self.current_signal):.4f}, Std: {np.std(self.current_signal):.4f}\n\n"
-            output += f"Click Decode button for decoding \n"
-
-            self.output_text.insert(tk.END, output)
-            self.plot_signal(scheme_name)
-            messagebox.showinfo("Success", "Signal generated successfully!")
+        # tracemalloc slows every allocation, so memory is only tracked while the box is ticked
+        if self.profile_stages.get():
+            self.profiler = Instrumentation([self.stage_totals], track_memory=True)
+        elif self.profiler is not None:
+            self.profiler.close()
+            self.profiler = None
 
+    def start_job(self, title: str, total_stages: int, work, on_done):
+
+        if self.job is not None:
+            self.job.cancel.set()
+        if self.profiler is not None:
+            self.stage_totals.reset()
+            self.generator.instrumentation = self.profiler
+        else:
+            self.generator.instrumentation = Instrumentation()
+        job = BackgroundJob(title, total_stages, self.generator.instrumentation)
+        job.future = self.executor.submit(self.run_job, job, work)
+        self.job = job
+        self.progress.configure(maximum=total_stages, value=0)
+        self.status_text.set(f"{title}: queued")
+        self.cancel_button.configure(state=tk.NORMAL)
+        self.root.after(POLL_MS, self.poll_job, job, on_done)
+
+    def poll_job(self, job: BackgroundJob, on_done):
+
+        if job is not self.job:
+            return
+        if not job.future.done():
+            self.progress.configure(value=job.completed)
+            self.status_text.set(f"{job.title}: {job.stage}")
+            self.root.after(POLL_MS, self.poll_job, job, on_done)
+            return
+        self.job = None
+        self.progress.configure(value=0)
+        self.cancel_button.configure(state=tk.DISABLED)
+        try:
+            result = job.future.result()
+        except JobCancelled:
+            self.status_text.set(f"{job.title}: cancelled")
+            return
         except Exception as e:
+            self.status_text.set(f"{job.title}: failed")
             messagebox.showerror("Error", f"Error: {str(e)}")
+            return
+        if job.cancel.is_set():
+            # cancelled during its last stage, after the final step() check: drop the result
+            self.status_text.set(f"{job.title}: cancelled")
+            return
+        self.status_text.set("Ready")
+        on_done(result)
 
-    def plot_signal(self, scheme_name):
+    def run_job(self, job: BackgroundJob, work):
+
+        with job.probe.stage(job.title):
+            try:
+                return work(job)
+            finally:
+                job.finish()
+
+    def show_stage_timing(self):
+
+        if self.generator.instrumentation is not self.profiler:
+            return
+        summary = f"\n{'=' * 60}\nSTAGE TIMING\n{'=' * 60}\n{self.stage_totals.summary()}\n"
+        self.output_text.insert(tk.END, summary)
+
+    def cancel_job(self):
 
-        self.ax.clear()
-        self.ax.plot(self.current_time, self.current_signal, linewidth=2, label="Signal")
-        self.ax.set_title(f"{scheme_name} Encoding", fontsize=12, fontweight='bold')
-        self.ax.set_xlabel("Time (bits)")
-        self.ax.set_ylabel("Voltage")
-        self.ax.grid(True, alpha=0.3)
-        self.ax.set_ylim(-1.5, 1.5)
+        if self.job is not None:
+            self.job.cancel.set()
+            self.status_text.set(f"{self.job.title}: cancelling...")
 
-        for i in range(min(20, len(self.current_data))):
-            bit = self.current_data[i]
-            self.ax.text(i + 0.5, 1.3, bit, ha='center', fontsize=9,
-                         bbox=dict(boxstyle='round', facecolor='yellow', alpha=0.3))
+    def generate_signal(self):
 
-        self.ax.legend(loc='upper right')
-        self.fig.tight_layout()
-        self.canvas.draw()
+        params = {
+            "input_type": self.input_type.get(),
+            "modulation": self.modulation.get(),
+            "signal_type": self.signal_type.get(),
+            "scheme": self.encoding_scheme.get(),
+            "scrambling": self.use_scrambling.get() and self.encoding_scheme.get() == "ami",
+            "scrambling_type": self.scrambling_type.get(),
+        }
+        if params["input_type"] == "digital":
+            data = self.binary_input.get().strip()
+            if not data or not set(data) <= {'0', '1'}:
+                messagebox.showerror("Error", "Enter valid binary string!")
+                return
+            params["data"] = data
+        total_stages = 2 + (params["input_type"] != "digital") + params["scrambling"]
+        self.start_job("Generate", total_stages, lambda job: self.run_generation(job, params), self.show_generation)
+
+    def run_generation(self, job: BackgroundJob, params: dict) -> dict:
+
+        # runs on the worker thread: backend calls only, no Tk access
+        if params["input_type"] == "digital":
+            data = BitBuffer.coerce(params["data"])
+        else:
+            job.step("PCM/DM")
+            analog_signal = self.generate_analog_signal(params["signal_type"])
+            data = self.generator.pcm_encode(analog_signal, 8, packed=True) \
+                if params["modulation"] == "pcm" else self.generator.delta_modulation(analog_signal, 0.15, packed=True)
+
+        scheme, scrambled_data = params["scheme"], None
+        if params["scrambling"]:
+            job.step("Scrambling")
+            scheme = params["scrambling_type"]
+            scrambled_data = self.generator.b8zs_scramble(data) if scheme == "b8zs" \
+                else self.generator.hdb3_scramble(data)
+
+        job.step("Encoding")
+        signal = self.generator.encode(data, scheme, compact=True)
+        job.step("Statistics")
+        mean, std = np.mean(signal), np.std(signal)
+        return {
+            "data": data, "scheme": scheme, "signal": signal, "scrambled_data": scrambled_data,
+            "mean": mean, "std": std,
+            "palindrome": self.generator.longest_palindrome_manacher(data, lazy=True),
+        }
+
+    def show_generation(self, result: dict):
+
+        self.current_data = result["data"]
+        self.current_scheme = result["scheme"]
+        self.current_signal = result["signal"]
+        self.current_palindrome = result["palindrome"]
+        scheme_name = self.generator.SCHEMES[self.current_scheme][0]
+        scrambled_data = result["scrambled_data"]
+
+        output = f"{'=' * 60}\nSIGNAL GENERATION REPORT\n{'=' * 60}\n\n"
+        output += f"Input Data: {self.current_data[:50]}{'...' if len(self.current_data) > 50 else ''}\n"
+        output += f"Data Length: {len(self.current_data)} bits\n"
+        output += f"Encoding: {scheme_name}\n\n"
+        output += f"{'=' * 60}\nPALINDROME \n{'=' * 60}\n"
+
+
+        if scrambled_data:
+            output += f"{'=' * 60}\nSCRAMBLING\n{'=' * 60}\n"
+            output += f"Type: {self.current_scheme.upper()}\n"
+            output += f"Data: {scrambled_data[:50]}{'...' if len(scrambled_data) > 50 else ''}\n\n"
+
+
+        output += f"Mean: {result['mean']:.4f}, Std: {result['std']:.4f}\n"
+        cache = self.generator.cache.stats()
+        output += f"Cache: {cache['hits']} hits / {cache['misses']} misses, {cache['nbytes'] / 1024:.1f} KiB\n\n"
+        output += f"Click Decode button for decoding \n"
+
+        self.output_text.delete(1.0, tk.END)
+        self.output_text.insert(tk.END, output)
+        with self.generator.instrumentation.stage("Plotting"):
+            self.plot_signal(scheme_name)
+        self.show_stage_timing()
+        messagebox.showinfo("Success", "Signal generated successfully!")
+
+    def plot_signal(self, scheme_name):
+
+        self.plot.show(self.current_signal, self.current_data, f"{scheme_name} Encoding")
 
     def decode_signal(self):
 
@@ -222,42 +365,58 @@ class DigitalSignalGeneratorGUI:
             messagebox.showwarning("Warning", "Generate a signal first!")
             return
 
-        try:
-            decode_map = {
-                "nrz_l": self.generator.decode_nrz_l,
-                "nrz_i": self.generator.decode_nrz_i,
-                "manchester": self.generator.decode_manchester,
-                "diff_manchester": self.generator.decode_differential_manchester,
-                "ami": self.generator.decode_ami
-            }
+        signal, scheme, data = self.current_signal, self.current_scheme, self.current_data
+        self.start_job("Decode", 2, lambda job: self.run_decoding(job, signal, scheme, data), self.show_decoding)
 
-            decoded = decode_map[self.current_scheme](self.current_signal)
-            accuracy = sum(c1 == c2 for c1, c2 in zip(self.current_data, decoded)) / len(self.current_data) * 100
+    def run_decoding(self, job: BackgroundJob, signal, scheme: str, data: BitBuffer) -> dict:
 
-            current_output = self.output_text.get(1.0, tk.END)
-            decode_report = f"\n{'=' * 60}\nDECODING \n{'=' * 60}\n"
-            decode_report += f"Original:  {self.current_data[:50]}{'...' if len(self.current_data) > 50 else ''}\n"
-            decode_report += f"Decoded:   {decoded[:50]}{'...' if len(decoded) > 50 else ''}\n"
+        job.step("Decoding")
+        decoded = self.generator.decode_bits(signal, scheme)
+        job.step("Comparing")
+        n = min(len(data), len(decoded))
+        correct = int(np.count_nonzero(data.unpack()[:n] == decoded.unpack()[:n]))
+        return {"data": data, "decoded": decoded, "correct": correct}
 
-            decode_report += f"Correct: {sum(c1 == c2 for c1, c2 in zip(self.current_data, decoded))}/{len(self.current_data)}\n"
+    def show_decoding(self, result: dict):
 
-            if accuracy == 100.0:
-                decode_report += f" decode done successfully\n"
+        data, decoded, correct = result["data"], result["decoded"], result["correct"]
+        accuracy = correct / len(data) * 100
 
-            self.output_text.delete(1.0, tk.END)
-            self.output_text.insert(tk.END, current_output + decode_report)
-            messagebox.showinfo("Decoding Complete", f"Success")
+        current_output = self.output_text.get(1.0, tk.END)
+        decode_report = f"\n{'=' * 60}\nDECODING \n{'=' * 60}\n"
+        decode_report += f"Original:  {data[:50]}{'...' if len(data) > 50 else ''}\n"
+        decode_report += f"Decoded:   {decoded[:50]}{'...' if len(decoded) > 50 else ''}\n"
 
-        except Exception as e:
-            messagebox.showerror("Error", f"Decoding failed: {str(e)}")
+        decode_report += f"Correct: {correct}/{len(data)}\n"
+
+        if accuracy == 100.0:
+            decode_report += f" decode done successfully\n"
+
+        self.output_text.delete(1.0, tk.END)
+        self.output_text.insert(tk.END, current_output + decode_report)
+        self.show_stage_timing()
+        messagebox.showinfo("Decoding Complete", f"Success")
 
     def clear_all(self):
 
+        self.cancel_job()
+        # forget the job so a result still in flight is treated as stale by poll_job
+        self.job = None
+        self.progress.configure(value=0)
+        self.cancel_button.configure(state=tk.DISABLED)
+        self.status_text.set("Ready")
         self.binary_input.delete(0, tk.END)
         self.binary_input.insert(0, "1100100100110")
         self.output_text.delete(1.0, tk.END)
-        self.ax.clear()
-        self.canvas.draw()
+        self.plot.clear()
+
+    def on_close(self):
+
+        self.cancel_job()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        if self.profiler is not None:
+            self.profiler.close()
+        self.root.destroy()
 
 
 if __name__ == "__main__":
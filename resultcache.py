@@ -0,0 +1,140 @@
+import hashlib
+import sys
+import threading
+
+import numpy as np
+
+from collections import OrderedDict
+from typing import Callable
+
+from bitbuffer import BitBuffer
+from compactwaveform import CompactWaveform
+
+
+def fingerprint(*parts) -> bytes:
+
+    # parts are arrays (hashed with their dtype and shape), BitBuffers, strings or other
+    # plain values whose repr is stable
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        if isinstance(part, BitBuffer):
+            part = part.unpack()
+        elif isinstance(part, CompactWaveform):
+            digest.update(repr((part.symbols_per_bit, part.sampling_rate, part.bit_offset)).encode())
+            part = part.levels
+        if isinstance(part, np.ndarray):
+            part = np.ascontiguousarray(part)
+            digest.update(f"{part.dtype.str}{part.shape}".encode())
+            if part.dtype == bool:
+                # bit arrays hash their packed form: an eighth of the bytes to digest
+                part = np.packbits(part.reshape(-1))
+            digest.update(part.view(np.uint8).reshape(-1) if part.size else b"")
+        elif isinstance(part, str):
+            digest.update(part.encode())
+        else:
+            digest.update(repr(part).encode())
+        digest.update(b"\x00")
+    return digest.digest()
+
+
+def _copy(value, frozen: bool = False):
+
+    # the cache keeps its own read-only copy of each result and hands every caller a fresh,
+    # writable one, so callers may modify what they get like an uncached result
+    if isinstance(value, np.ndarray):
+        value = value.copy()
+        value.flags.writeable = not frozen
+        return value
+    if isinstance(value, BitBuffer):
+        return BitBuffer(_copy(value.packed, frozen), value.n_bits)
+    if isinstance(value, CompactWaveform):
+        return CompactWaveform(_copy(value.levels, frozen), value.symbols_per_bit, value.sampling_rate,
+                               value.bit_duration, value.bit_offset)
+    if isinstance(value, tuple):
+        return tuple(_copy(item, frozen) for item in value)
+    return value
+
+
+def _nbytes(value) -> int:
+
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, BitBuffer):
+        return value.packed.nbytes
+    if isinstance(value, CompactWaveform):
+        return value.nbytes
+    if isinstance(value, tuple):
+        return sum(_nbytes(item) for item in value)
+    return sys.getsizeof(value)
+
+
+class ResultCache:
+
+    # LRU map from fingerprint keys to results, bounded by the total size of the cached
+    # buffers. Results larger than the whole budget are returned but never stored, and
+    # max_bytes=0 turns the cache off.
+
+    def __init__(self, max_bytes: int = 64 << 20):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+
+        return len(self._entries)
+
+    def get(self, key: bytes, compute: Callable[[], object]):
+
+        if not self.max_bytes:
+            return compute()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return _copy(entry[0])
+            self.misses += 1
+        # computed outside the lock; two threads missing on the same key both compute
+        value = compute()
+        self.put(key, value)
+        return value
+
+    def put(self, key: bytes, value) -> None:
+
+        size = _nbytes(value)
+        if size > self.max_bytes:
+            return
+        value = _copy(value, frozen=True)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.nbytes -= previous[1]
+            self._entries[key] = (value, size)
+            self.nbytes += size
+            while self.nbytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.nbytes -= evicted
+                self.evictions += 1
+
+    def clear(self) -> None:
+
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def stats(self) -> dict:
+
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "nbytes": self.nbytes,
+            "max_bytes": self.max_bytes,
+        }
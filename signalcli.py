@@ -0,0 +1,309 @@
+import argparse
+import os
+import sys
+
+from contextlib import nullcontext
+from typing import BinaryIO, Iterator
+
+# numpy and the generator are imported inside the commands, so --help and argument errors
+# return without loading them; Tk and matplotlib are never imported here
+
+
+INPUT_FORMATS = ("raw", "ascii", "hex")
+CHUNK_BYTES = 1 << 16
+
+
+def _open_input(path: str):
+
+    # the standard streams are used but left open
+    return nullcontext(sys.stdin.buffer) if path == "-" else open(path, "rb")
+
+
+def _open_output(path: str):
+
+    return nullcontext(sys.stdout.buffer) if path == "-" else open(path, "wb")
+
+
+def read_bits(stream: BinaryIO, fmt: str, chunk_bytes: int = CHUNK_BYTES) -> Iterator:
+
+    # yields bool arrays; ASCII and hex input may contain whitespace and line breaks
+    import numpy as np
+
+    if fmt == "hex":
+        nibbles = np.full(256, 255, dtype=np.uint8)
+        for digit in b"0123456789abcdefABCDEF":
+            nibbles[digit] = int(chr(digit), 16)
+    for chunk in iter(lambda: stream.read(chunk_bytes), b""):
+        data = np.frombuffer(chunk, dtype=np.uint8)
+        if fmt == "raw":
+            yield np.unpackbits(data).view(bool)
+            continue
+        data = data[~np.isin(data, np.frombuffer(b" \t\r\n", dtype=np.uint8))]
+        if fmt == "ascii":
+            if np.any((data != ord('0')) & (data != ord('1'))):
+                raise ValueError("ASCII input may only contain '0', '1' and whitespace")
+            yield data == ord('1')
+        elif fmt == "hex":
+            values = nibbles[data]
+            if np.any(values == 255):
+                raise ValueError("hex input may only contain hex digits and whitespace")
+            yield np.unpackbits(values[:, None], axis=1)[:, 4:].reshape(-1).view(bool)
+        else:
+            raise ValueError(f"Unknown input format: {fmt}")
+
+
+def write_bits(stream: BinaryIO, chunks, fmt: str) -> int:
+
+    # raw and hex output pack whole bytes / nibbles, so a partial unit is carried to the next
+    # chunk and zero padded at the end; returns the number of bits written
+    import numpy as np
+
+    unit = {"raw": 8, "hex": 4, "ascii": 1}[fmt]
+    pending, n_bits = np.empty(0, dtype=bool), 0
+    for chunk in chunks:
+        bits = np.concatenate([pending, chunk.unpack()])
+        n_bits += len(chunk)
+        usable = bits.size // unit * unit
+        pending = bits[usable:]
+        _write_units(stream, bits[:usable], fmt)
+    if pending.size:
+        _write_units(stream, np.concatenate([pending, np.zeros(unit - pending.size, dtype=bool)]), fmt)
+    if fmt != "raw":
+        stream.write(b"\n")
+    return n_bits
+
+
+def _write_units(stream: BinaryIO, bits, fmt: str) -> None:
+
+    import numpy as np
+
+    if fmt == "raw":
+        stream.write(np.packbits(bits).tobytes())
+    elif fmt == "ascii":
+        stream.write((bits.astype(np.uint8) + ord('0')).tobytes())
+    else:
+        values = np.packbits(bits.reshape(-1, 4), axis=1)[:, 0] >> 4
+        stream.write(np.frombuffer(b"0123456789abcdef", dtype=np.uint8)[values].tobytes())
+
+
+def _generator(args):
+
+    from digitalsignalgenerator import DigitalSignalGenerator
+
+    # one pass over a stream never repeats an input, so the result cache is off
+    generator = DigitalSignalGenerator(cache_bytes=0)
+    generator.sampling_rate = args.sampling_rate
+    return generator
+
+
+def _output_format(args) -> str:
+
+    # npy and sgw are patched after the last chunk, so they are only picked for a regular file
+    # named .npy or .sgw; stdout, pipes and any other name get raw samples
+    if args.output_format:
+        return args.output_format
+    if args.output == "-" or (os.path.exists(args.output) and not os.path.isfile(args.output)):
+        return "raw"
+    return {".npy": "npy", ".sgw": "sgw"}.get(os.path.splitext(args.output)[1].lower(), "raw")
+
+
+def cmd_encode(args) -> str:
+
+    import numpy as np
+    from waveformio import WaveformHeader, write_samples
+
+    fmt = _output_format(args)
+    if fmt == "sgw" and args.levels:
+        raise ValueError("--levels output has no sampling rate to record; use npy or raw")
+    header = WaveformHeader(args.scheme, args.sampling_rate, 0, 0)
+    generator = _generator(args)
+    with _open_input(args.input) as source, _open_output(args.output) as out:
+        waveforms = generator.encode_stream(read_bits(source, args.format, args.chunk_bytes), args.scheme,
+                                            compact=True)
+        if args.levels:
+            chunks = (waveform.levels for waveform in waveforms)
+        else:
+            chunks = (np.repeat(waveform.levels, waveform.samples_per_symbol) for waveform in waveforms)
+        n_samples = write_samples(out, chunks, fmt, np.int8, header)
+    unit = "levels" if args.levels else "samples"
+    return f"{args.scheme}: wrote {n_samples} {unit} to {args.output}"
+
+
+def cmd_scramble(args) -> str:
+
+    generator = _generator(args)
+    n_symbols = 0
+    with _open_input(args.input) as source, _open_output(args.output) as out:
+        for symbols in generator.scramble_stream(read_bits(source, args.format, args.chunk_bytes), args.scheme):
+            out.write(symbols.encode("ascii"))
+            n_symbols += len(symbols)
+        out.write(b"\n")
+    return f"{args.scheme}: wrote {n_symbols} symbols to {args.output}"
+
+
+def _read_samples(args) -> Iterator:
+
+    # files are memory mapped (.sgw/.npy/raw) and read block by block; stdin is raw --dtype samples
+    import numpy as np
+
+    samples_per_chunk = args.sampling_rate << 12
+    dtype = np.dtype(args.dtype)
+    with _open_input(args.input) as source:
+        for chunk in iter(lambda: source.read(samples_per_chunk * dtype.itemsize), b""):
+            yield np.frombuffer(chunk[:len(chunk) // dtype.itemsize * dtype.itemsize], dtype=dtype)
+
+
+def _recovered_chunks(args):
+
+    # retimes the capture with ClockRecovery and decodes one sample per symbol; the sampling
+    # rate (given, or from a .sgw header) only seeds the bit rate estimate
+    import numpy as np
+    from clockrecovery import ClockRecovery
+
+    nominal = args.sampling_rate
+    if args.input == "-":
+        if args.scheme is None:
+            raise ValueError("a scheme is needed to decode raw samples from stdin")
+        args.sampling_rate = args.sampling_rate or 100
+        samples = _read_samples(args)
+    else:
+        from waveformio import open_waveform
+
+        # opened without the scheme, so only a .sgw header fills in scheme and rate
+        samples, header = open_waveform(args.input, dtype=args.dtype)
+        if header.scheme is not None:
+            if args.scheme is not None and args.scheme != header.scheme:
+                raise ValueError(f"{args.input} holds a {header.scheme} waveform, not {args.scheme}")
+            args.scheme = header.scheme
+            nominal = nominal or header.sampling_rate
+        elif args.scheme is None:
+            raise ValueError(f"{args.input} has no header; pass the scheme it was encoded with")
+    recovery = ClockRecovery(args.scheme, 2, nominal, aperture=0.0 if args.sampling == "mid" else 0.5)
+    generator = _generator(args)
+    generator.sampling_rate = 2
+    waveforms = recovery.stream(samples)
+    chunks = generator.decode_stream((np.repeat(waveform.levels, waveform.samples_per_symbol)
+                                      for waveform in waveforms), args.scheme)
+    return chunks, recovery
+
+
+def cmd_decode(args) -> str:
+
+    if args.recover_clock:
+        chunks, recovery = _recovered_chunks(args)
+        with _open_output(args.output) as out:
+            n_bits = write_bits(out, chunks, args.output_format)
+        return (f"decoded {n_bits} bits to {args.output}; recovered {recovery.samples_per_bit:.4f} samples "
+                f"per bit, first bit at sample {recovery.offset:.2f}")
+    if args.input == "-":
+        if args.scheme is None:
+            raise ValueError("a scheme is needed to decode raw samples from stdin")
+        args.sampling_rate = args.sampling_rate or 100
+        chunks = _generator(args).decode_stream(_read_samples(args), args.scheme, args.sampling)
+    else:
+        from waveformio import decode_file
+
+        chunks = decode_file(args.input, args.scheme, args.sampling_rate, args.sampling, args.dtype)
+    with _open_output(args.output) as out:
+        n_bits = write_bits(out, chunks, args.output_format)
+    return f"decoded {n_bits} bits to {args.output}"
+
+
+def cmd_ber(args) -> str:
+
+    from channel import ChannelModel, ber_sweep, format_ber_table, snr_points
+
+    channel = ChannelModel(wander=args.wander, wander_period=args.wander_period, jitter=args.jitter,
+                           drift_ppm=args.drift_ppm)
+    results = ber_sweep(args.schemes, snr_points(*args.snr), channel, args.bits, args.trials,
+                        sampling_rate=args.sampling_rate, sampling=args.sampling, seed=args.seed,
+                        max_workers=args.workers)
+    with _open_output(args.output) as out:
+        out.write((format_ber_table(results) + "\n").encode("ascii"))
+    return f"BER sweep: {len(args.schemes)} schemes, {args.trials} x {args.bits} bits per point"
+
+
+def build_parser() -> argparse.ArgumentParser:
+
+    parser = argparse.ArgumentParser(prog="python -m signalcli",
+                                     description="Encode, scramble and decode bit streams and measure BER without the GUI")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    encode = commands.add_parser("encode", help="line-encode bits into int8 waveform samples")
+    encode.add_argument("scheme", help="nrz_l, nrz_i, manchester, diff_manchester, ami, b8zs or hdb3")
+    encode.add_argument("--levels", action="store_true",
+                        help="write one level per symbol instead of sampling-rate samples per bit")
+    encode.add_argument("--output-format", choices=("npy", "raw", "sgw"),
+                        help="default from the output name: npy for .npy, sgw for .sgw, otherwise raw")
+    encode.set_defaults(run=cmd_encode)
+
+    scramble = commands.add_parser("scramble", help="write the B8ZS/HDB3 symbol string (0, 1, V, B)")
+    scramble.add_argument("scheme", choices=("b8zs", "hdb3"))
+    scramble.set_defaults(run=cmd_scramble)
+
+    for command in (encode, scramble):
+        command.add_argument("-i", "--input", default="-", help="bit file, '-' for stdin (default)")
+        command.add_argument("-o", "--output", default="-", help="output file, '-' for stdout (default)")
+        command.add_argument("-f", "--format", choices=INPUT_FORMATS, default="ascii",
+                             help="input bits: raw packed bytes (MSB first), ASCII 0/1 or hex digits")
+        command.add_argument("--chunk-bytes", type=int, default=CHUNK_BYTES)
+
+    decode = commands.add_parser("decode", help="decode waveform samples back into bits")
+    decode.add_argument("scheme", nargs="?", help="scheme the waveform was encoded with (.sgw files record it)")
+    decode.add_argument("-i", "--input", default="-", help=".sgw, .npy or raw sample file, '-' for stdin")
+    decode.add_argument("-o", "--output", default="-")
+    decode.add_argument("--dtype", default="int8", help="sample type of raw input, e.g. int8 or float32")
+    decode.add_argument("--sampling", choices=("mean", "mid"), default="mean")
+    decode.add_argument("--output-format", choices=INPUT_FORMATS, default="ascii")
+    decode.add_argument("--recover-clock", action="store_true",
+                        help="estimate bit rate and phase from the transitions instead of trusting the header")
+    decode.set_defaults(run=cmd_decode)
+
+    ber = commands.add_parser("ber", help="Monte Carlo bit error rate versus SNR over a simulated channel")
+    ber.add_argument("schemes", nargs="+")
+    ber.add_argument("--snr", type=float, nargs=3, default=(-10.0, 10.0, 2.0), metavar=("START", "STOP", "STEP"),
+                     help="SNR points in dB, per sample (default -10 10 2)")
+    ber.add_argument("--bits", type=int, default=10_000, help="bits per trial")
+    ber.add_argument("--trials", type=int, default=20, help="trials per SNR point")
+    ber.add_argument("--wander", type=float, default=0.0, help="baseline wander amplitude")
+    ber.add_argument("--wander-period", type=float, default=1000.0, help="baseline wander period in bits")
+    ber.add_argument("--jitter", type=float, default=0.0, help="clock jitter, std in samples")
+    ber.add_argument("--drift-ppm", type=float, default=0.0, help="receiver clock offset in ppm")
+    ber.add_argument("--sampling", choices=("mean", "mid"), default="mean")
+    ber.add_argument("--seed", type=int, default=0)
+    ber.add_argument("--workers", type=int, help="worker processes (default: all cores)")
+    ber.add_argument("-o", "--output", default="-")
+    ber.set_defaults(run=cmd_ber)
+
+    for command in (encode, scramble):
+        command.add_argument("--sampling-rate", type=int, default=100, help="samples per bit (default 100)")
+    ber.add_argument("--sampling-rate", type=int, default=8, help="samples per bit (default 8)")
+    decode.add_argument("--sampling-rate", type=int,
+                        help="samples per bit; taken from .sgw headers, otherwise 100")
+    for command in (encode, scramble, decode, ber):
+        command.add_argument("-q", "--quiet", action="store_true", help="no summary line on stderr")
+    return parser
+
+
+def main(argv=None) -> int:
+
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.sampling_rate is not None and args.sampling_rate < 1:
+        parser.error("--sampling-rate must be at least 1")
+    try:
+        summary = args.run(args)
+    except BrokenPipeError:
+        # the reader (e.g. head) went away: stop quietly and keep the interpreter from
+        # failing again while flushing stdout at exit
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 1
+    except (OSError, ValueError) as e:
+        parser.exit(1, f"{parser.prog}: error: {e}\n")
+    if not args.quiet:
+        print(summary, file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,141 @@
+import numpy as np
+
+from typing import Optional, Tuple
+
+from bitbuffer import BitBuffer
+from compactwaveform import CompactWaveform
+
+
+MAX_LABELS = 40
+
+
+def decimated_edges(waveform: CompactWaveform, start_bit: int, stop_bit: int,
+                    columns: int) -> Tuple[np.ndarray, np.ndarray]:
+
+    # exact step corners while the window has no more symbols than pixel columns; past that
+    # each column becomes a vertical min..max bar, so the point count follows the screen
+    # width instead of the bit count and no transition inside a column is lost
+    part = waveform.window(start_bit, stop_bit)
+    levels = part.levels
+    columns = max(int(columns), 1)
+    if levels.size <= 2 * columns:
+        return part.edges()
+    starts = (np.arange(columns) * levels.size) // columns
+    low = np.minimum.reduceat(levels, starts)
+    high = np.maximum.reduceat(levels, starts)
+    x = np.append(np.repeat(starts, 2), levels.size) / waveform.symbols_per_bit + part.bit_offset
+    y = np.append(np.column_stack([low, high]).ravel(), levels[-1])
+    return x, y
+
+
+class SignalPlot:
+
+    # Owns the signal line and bit labels of one axes. Only the visible bit range is turned
+    # into points, and it is recomputed whenever the x limits change (toolbar pan/zoom).
+    # With a blitting canvas the line and labels are animated artists drawn over a cached
+    # background, so content-only updates skip the full figure redraw.
+
+    def __init__(self, ax, canvas, toolbar=None):
+        self.ax = ax
+        self.canvas = canvas
+        self.toolbar = toolbar
+        self.waveform: Optional[CompactWaveform] = None
+        self.bits: Optional[BitBuffer] = None
+        self.blit = bool(getattr(canvas, "supports_blit", False))
+        self.background = None
+        self.drawn_columns = 0
+
+        self.line, = ax.plot([], [], linewidth=2, label="Signal", animated=self.blit)
+        self.labels = [ax.text(0, 1.3, "", ha='center', fontsize=9, visible=False, animated=self.blit,
+                               bbox=dict(boxstyle='round', facecolor='yellow', alpha=0.3))
+                       for _ in range(MAX_LABELS)]
+        ax.set_xlabel("Time (bits)")
+        ax.set_ylabel("Voltage")
+        ax.grid(True, alpha=0.3)
+        ax.set_ylim(-1.5, 1.5)
+        self.legend = ax.legend(loc='upper right')
+        self.legend.set_visible(False)
+        ax.figure.tight_layout()
+
+        ax.callbacks.connect("xlim_changed", lambda _: self.refresh())
+        canvas.mpl_connect("draw_event", self.on_draw)
+
+    def columns(self) -> int:
+
+        return max(int(self.ax.bbox.width), 1)
+
+    def show(self, waveform: CompactWaveform, bits: BitBuffer, title: str):
+
+        extent = (0.0, float(waveform.n_bits))
+        redraw = (self.background is None or title != self.ax.get_title()
+                  or tuple(self.ax.get_xlim()) != extent)
+        self.waveform, self.bits = waveform, bits
+        self.ax.set_title(title, fontsize=12, fontweight='bold')
+        self.legend.set_visible(True)
+        if self.toolbar is not None:
+            # forget the previous signal's zoom history; home is now the whole new signal
+            self.toolbar.update()
+        self.ax.set_xlim(*extent, emit=False)
+        self.refresh()
+        self.draw(redraw)
+
+    def clear(self):
+
+        self.waveform, self.bits = None, None
+        self.ax.set_title("")
+        self.legend.set_visible(False)
+        self.refresh()
+        self.draw(True)
+
+    def refresh(self):
+
+        # recompute the visible points and labels; drawing is left to the caller or the
+        # redraw that follows a toolbar pan/zoom
+        self.drawn_columns = self.columns()
+        if self.waveform is None or not self.waveform.n_bits:
+            self.line.set_data([], [])
+            for label in self.labels:
+                label.set_visible(False)
+            return
+
+        x0, x1 = self.ax.get_xlim()
+        start = max(int(np.floor(x0)), 0)
+        stop = min(int(np.ceil(x1)), self.waveform.n_bits)
+        self.line.set_data(*decimated_edges(self.waveform, start, stop, self.drawn_columns))
+
+        shown = stop - start if 0 < stop - start <= MAX_LABELS else 0
+        if shown:
+            # byte-aligned slice shares the packed bytes, so only the visible bits are unpacked
+            aligned = start - start % 8
+            text = self.bits[aligned:stop].to_str()[start - aligned:]
+        for i, label in enumerate(self.labels):
+            label.set_visible(i < shown)
+            if i < shown:
+                label.set_position((start + i + 0.5, 1.3))
+                label.set_text(text[i])
+
+    def draw(self, full: bool = False):
+
+        if full or not self.blit or self.background is None:
+            self.canvas.draw_idle()
+            return
+        self.canvas.restore_region(self.background)
+        self.draw_animated()
+        self.canvas.blit(self.ax.bbox)
+
+    def draw_animated(self):
+
+        self.ax.draw_artist(self.line)
+        for label in self.labels:
+            if label.get_visible():
+                self.ax.draw_artist(label)
+
+    def on_draw(self, event):
+
+        if not self.blit:
+            return
+        # a resize changes the column count, so resample before painting the line
+        if self.columns() != self.drawn_columns:
+            self.refresh()
+        self.background = self.canvas.copy_from_bbox(self.ax.bbox)
+        self.draw_animated()
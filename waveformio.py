@@ -0,0 +1,170 @@
+import struct
+
+import numpy as np
+
+from typing import BinaryIO, Iterator, Optional, Tuple
+
+from bitbuffer import BitBuffer
+from digitalsignalgenerator import DigitalSignalGenerator
+
+
+# .sgw layout: a 64-byte little-endian header followed by the samples as one flat array
+# magic, sample dtype (numpy str, e.g. '|i1'), sampling rate, bit count, sample count, scheme
+MAGIC = b"SGWAVE01"
+HEADER_FORMAT = "<8s4sIQQ16s16x"
+HEADER_BYTES = struct.calcsize(HEADER_FORMAT)
+NPY_MAGIC = b"\x93NUMPY"
+# .npy headers are written at this fixed size so the shape can be patched in place once
+# the sample count of a streamed output is known
+NPY_HEADER_BYTES = 128
+
+
+class WaveformHeader:
+
+    __slots__ = ("scheme", "sampling_rate", "n_bits", "n_samples", "dtype")
+
+    def __init__(self, scheme: Optional[str], sampling_rate: int, n_bits: int, n_samples: int, dtype=np.int8):
+        self.scheme = scheme
+        self.sampling_rate = sampling_rate
+        self.n_bits = n_bits
+        self.n_samples = n_samples
+        self.dtype = np.dtype(dtype)
+
+    @classmethod
+    def for_scheme(cls, scheme: str, sampling_rate: int, n_bits: int, dtype=np.int8) -> "WaveformHeader":
+
+        return cls(scheme, sampling_rate, n_bits, n_bits * samples_per_bit(scheme, sampling_rate), dtype)
+
+    def pack(self) -> bytes:
+
+        return struct.pack(HEADER_FORMAT, MAGIC, self.dtype.str.encode("ascii"), self.sampling_rate,
+                           self.n_bits, self.n_samples, (self.scheme or "").encode("ascii"))
+
+    @classmethod
+    def unpack(cls, data: bytes) -> "WaveformHeader":
+
+        magic, dtype, sampling_rate, n_bits, n_samples, scheme = struct.unpack(HEADER_FORMAT, data[:HEADER_BYTES])
+        if magic != MAGIC:
+            raise ValueError("not a waveform file (bad magic)")
+        scheme = scheme.rstrip(b"\x00").decode("ascii") or None
+        return cls(scheme, sampling_rate, n_bits, n_samples, dtype.rstrip(b"\x00").decode("ascii"))
+
+    def __repr__(self) -> str:
+
+        return (f"WaveformHeader(scheme={self.scheme!r}, sampling_rate={self.sampling_rate}, "
+                f"n_bits={self.n_bits}, n_samples={self.n_samples}, dtype={self.dtype.str!r})")
+
+
+def samples_per_bit(scheme: str, sampling_rate: int) -> int:
+
+    # whole symbols only, as the encoders produce them: sampling_rate // symbols_per_bit each
+    if scheme not in DigitalSignalGenerator.SCHEMES:
+        raise ValueError(f"Unknown encoding scheme: {scheme}")
+    symbols_per_bit = DigitalSignalGenerator.SCHEMES[scheme][1]
+    return sampling_rate // symbols_per_bit * symbols_per_bit
+
+
+def create_waveform(path: str, scheme: str, n_bits: int, sampling_rate: int, dtype=np.int8) -> np.memmap:
+
+    # writable memmap behind a .sgw header, sized for n_bits of scheme; pass it as out= to encode()
+    header = WaveformHeader.for_scheme(scheme, sampling_rate, n_bits, dtype)
+    with open(path, "wb") as f:
+        f.write(header.pack())
+        f.truncate(HEADER_BYTES + header.n_samples * header.dtype.itemsize)
+    return np.memmap(path, dtype=header.dtype, mode="r+", offset=HEADER_BYTES, shape=(header.n_samples,))
+
+
+def open_waveform(path: str, mode: str = "r", dtype=None, sampling_rate: Optional[int] = None,
+                  scheme: Optional[str] = None) -> Tuple[np.ndarray, WaveformHeader]:
+
+    # .sgw files carry their own header; .npy and raw files (int8 unless dtype says otherwise)
+    # take scheme and sampling rate from the arguments. Nothing is read beyond the header.
+    with open(path, "rb") as f:
+        start = f.read(HEADER_BYTES)
+    if start.startswith(MAGIC):
+        header = WaveformHeader.unpack(start)
+        signal = np.memmap(path, dtype=header.dtype, mode=mode, offset=HEADER_BYTES, shape=(header.n_samples,))
+    else:
+        if start.startswith(NPY_MAGIC):
+            signal = np.load(path, mmap_mode=mode).reshape(-1)
+        else:
+            signal = np.memmap(path, dtype=np.dtype(dtype or np.int8), mode=mode)
+        rate = sampling_rate or DigitalSignalGenerator().sampling_rate
+        n_bits = signal.size // samples_per_bit(scheme, rate) if scheme else 0
+        header = WaveformHeader(scheme, rate, n_bits, signal.size, signal.dtype)
+    if sampling_rate is not None and sampling_rate != header.sampling_rate:
+        raise ValueError(f"{path} was written at {header.sampling_rate} samples per bit, not {sampling_rate}")
+    if scheme is not None and header.scheme is not None and scheme != header.scheme:
+        raise ValueError(f"{path} holds a {header.scheme} waveform, not {scheme}")
+    return signal, header
+
+
+def iter_blocks(signal: np.ndarray, block_samples: int) -> Iterator[np.ndarray]:
+
+    for start in range(0, signal.shape[-1], block_samples):
+        yield signal[..., start:start + block_samples]
+
+
+def npy_header(dtype, n_samples: int) -> bytes:
+
+    text = repr({"descr": np.dtype(dtype).str, "fortran_order": False, "shape": (n_samples,)})
+    text = text.ljust(NPY_HEADER_BYTES - 11) + "\n"
+    return NPY_MAGIC + b"\x01\x00" + struct.pack("<H", len(text)) + text.encode("latin1")
+
+
+def write_samples(stream: BinaryIO, chunks, fmt: str, dtype=np.int8,
+                  header: Optional[WaveformHeader] = None) -> int:
+
+    # streams 1-D sample chunks as raw binary, one .npy array or a .sgw file; the npy shape
+    # and the sgw sample count are patched in after the last chunk, so both need a seekable
+    # stream. Returns the number of samples written.
+    dtype = np.dtype(dtype)
+    if fmt == "sgw" and header is None:
+        raise ValueError("sgw output needs a WaveformHeader")
+    if fmt in ("npy", "sgw"):
+        if not stream.seekable():
+            raise ValueError(f"{fmt} output needs a seekable file; use raw output for pipes")
+        start = stream.tell()
+        stream.write(npy_header(dtype, 0) if fmt == "npy" else header.pack())
+    n_samples = 0
+    for chunk in chunks:
+        stream.write(np.ascontiguousarray(chunk, dtype=dtype).tobytes())
+        n_samples += chunk.size
+    if fmt in ("npy", "sgw"):
+        end = stream.tell()
+        stream.seek(start)
+        if fmt == "npy":
+            stream.write(npy_header(dtype, n_samples))
+        else:
+            header.dtype, header.n_samples = dtype, n_samples
+            header.n_bits = n_samples // samples_per_bit(header.scheme, header.sampling_rate)
+            stream.write(header.pack())
+        stream.seek(end)
+    return n_samples
+
+
+def encode_to_file(path: str, source, scheme: str, sampling_rate: int, chunk_size: int = 1 << 16,
+                   dtype=np.int8) -> WaveformHeader:
+
+    # streams bits (anything encode_stream accepts) into a .sgw file, one chunk in memory at a time
+    generator = DigitalSignalGenerator(cache_bytes=0)
+    generator.sampling_rate = sampling_rate
+    header = WaveformHeader(scheme, sampling_rate, 0, 0, dtype)
+    chunks = (np.repeat(waveform.levels, waveform.samples_per_symbol)
+              for waveform in generator.encode_stream(source, scheme, chunk_size, compact=True))
+    with open(path, "wb") as f:
+        write_samples(f, chunks, "sgw", dtype, header)
+    return header
+
+
+def decode_file(path: str, scheme: Optional[str] = None, sampling_rate: Optional[int] = None,
+                sampling: str = "mean", dtype=None, block_bits: int = 1 << 16) -> Iterator[BitBuffer]:
+
+    # decodes a memory-mapped .sgw/.npy/raw waveform block_bits at a time
+    signal, header = open_waveform(path, dtype=dtype, sampling_rate=sampling_rate, scheme=scheme)
+    if header.scheme is None:
+        raise ValueError(f"{path} has no header; pass the scheme it was encoded with")
+    generator = DigitalSignalGenerator(cache_bytes=0)
+    generator.sampling_rate = header.sampling_rate
+    yield from generator.decode_stream(iter_blocks(signal, block_bits * header.sampling_rate), header.scheme,
+                                       sampling)